@@ -0,0 +1,195 @@
+import argparse
+import random
+import time
+
+# Small vocabulary used to build synthetic transcripts
+WORDS = [
+    "the", "model", "video", "lecture", "students", "energy", "system", "data", "network", "history",
+    "question", "example", "process", "result", "people", "research", "theory", "market", "city", "river",
+    "today", "we", "will", "look", "at", "how", "this", "works", "and", "why", "it", "matters", "for", "our",
+    "understanding", "of", "science", "Paris", "Einstein", "Google", "Amazon", "Europe", "NASA", "Python"
+]
+
+def synthetic_text(num_words, seed=0):
+    """Build a synthetic transcript of roughly num_words words split into sentences."""
+    rng = random.Random(seed)
+    sentences = []
+    remaining = num_words
+    while remaining > 0:
+        length = min(remaining, rng.randint(8, 20))
+        words = [rng.choice(WORDS) for _ in range(length)]
+        sentences.append(" ".join(words).capitalize() + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+def bench_summarize(num_chunks=8, chunk_words=800, batch_size=4, repeats=1):
+    """Compare chunks/second of one-chunk-per-call summarization against batched inference."""
+    import youtube_summarizer
+
+    chunks = [synthetic_text(chunk_words, seed=i) for i in range(num_chunks)]
+    summarizer = youtube_summarizer.get_summarizer()
+
+    # Warm-up call so neither run pays for lazy initialization
+    youtube_summarizer.summarize_chunks(summarizer, chunks[:1], max_length=60, min_length=20, batch_size=1,
+                                        use_cache=False)
+
+    for label, size in (("loop (batch_size=1)", 1), (f"batched (batch_size={batch_size})", batch_size)):
+        started = time.perf_counter()
+        for _ in range(repeats):
+            youtube_summarizer.summarize_chunks(summarizer, chunks, max_length=60, min_length=20, batch_size=size,
+                                                use_cache=False)
+        elapsed = time.perf_counter() - started
+        print(f"{label}: {num_chunks * repeats / elapsed:.2f} chunks/s ({elapsed:.2f}s)")
+
+def bench_key_terms(sizes=(10_000, 100_000, 1_000_000), max_terms=24, n_process=None):
+    """Compare the old sampled key-term extraction against the streaming full-coverage extractor."""
+    import nlp_resources
+    import wikipedia_integration
+
+    nlp = nlp_resources.get_spacy()
+    if nlp is None:
+        print("spaCy model not available")
+        return
+
+    for size in sizes:
+        # About six characters per synthetic word
+        text = synthetic_text(size // 6 + 20, seed=size)[:size]
+
+        # Old approach: full pipeline on the first 5000 characters plus 2000-character middle and end samples
+        samples = [text[:5000]]
+        if len(text) > 5000:
+            samples.append(text[len(text) // 2:len(text) // 2 + 2000])
+        if len(text) > 7000:
+            samples.append(text[-2000:])
+        sampled_coverage = sum(len(sample) for sample in samples) / len(text)
+        started = time.perf_counter()
+        for _ in nlp.pipe(samples, disable=["lemmatizer"]):
+            pass
+        sampled_time = time.perf_counter() - started
+
+        # The same full pipeline at full coverage
+        started = time.perf_counter()
+        for _ in nlp.pipe(wikipedia_integration.iter_text_chunks(text), disable=["lemmatizer"]):
+            pass
+        full_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        terms = wikipedia_integration.extract_key_terms(text, nlp, max_terms, n_process=n_process)
+        streaming_time = time.perf_counter() - started
+
+        print(f"{size:>9} chars | sampled: {sampled_time:.2f}s at {sampled_coverage:.0%} coverage"
+              f" | full pipeline: {full_time:.2f}s | streaming: {streaming_time:.2f}s"
+              f" ({size / streaming_time / 1000:.0f}k chars/s, {len(terms)} terms)")
+
+def bench_fast_summary(sizes=(2_000, 10_000, 100_000), repeats=3, abstractive=False):
+    """Time the extractive fast summary, optionally against the abstractive pipeline, on synthetic transcripts."""
+    import youtube_summarizer
+
+    for size in sizes:
+        text = synthetic_text(size, seed=size)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            summary = youtube_summarizer.extractive_summary(text, 100, 200)
+        fast_time = (time.perf_counter() - started) / repeats
+        line = f"{size:>7} words | fast: {fast_time * 1000:.1f} ms ({len(summary.split())} words)"
+
+        if abstractive:
+            # A new random text, so no chunk summary comes from the cache
+            fresh_text = synthetic_text(size, seed=random.randrange(1 << 30))
+            started = time.perf_counter()
+            youtube_summarizer.summarize_text(fresh_text, 100, 200)
+            line += f" | best: {time.perf_counter() - started:.1f} s"
+        print(line)
+
+def synthetic_transcript_items(num_items, seed=0):
+    """Build synthetic caption items of a few words each, with occasional pauses."""
+    rng = random.Random(seed)
+    items = []
+    start = 0.0
+    for _ in range(num_items):
+        duration = rng.uniform(1.5, 4.0)
+        items.append({"text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 9))),
+                      "start": round(start, 2), "duration": round(duration, 2)})
+        start += duration + (rng.uniform(1.0, 3.0) if rng.random() < 0.02 else 0.0)
+    return items
+
+def _segments_per_item_scan(items, boundaries, sentences, sentence_timestamps):
+    """The previous segment assembly: scan every item and every sentence for each segment."""
+    texts = []
+    for i, start_time in enumerate(boundaries):
+        end_time = boundaries[i + 1] if i < len(boundaries) - 1 else None
+        segment_text = ""
+        for item in items:
+            if item["start"] >= start_time and (end_time is None or item["start"] < end_time):
+                segment_text += item["text"] + " "
+        segment_sentences = []
+        for j, timestamp in enumerate(sentence_timestamps):
+            if timestamp >= start_time and (end_time is None or timestamp < end_time):
+                segment_sentences.append(sentences[j])
+        texts.append(segment_text)
+    return texts
+
+def bench_segments(num_items=100_000, num_segments=12):
+    """Compare per-item scanning against bisect-based segment assembly on a long synthetic transcript."""
+    import timestamps_feature
+    import transcript_store
+
+    items = synthetic_transcript_items(num_items)
+    index = transcript_store.TranscriptIndex(items)
+    # One sentence per item keeps the sentence arrays as long as the item arrays
+    sentences = [item["text"] for item in items]
+    sentence_timestamps = [item["start"] for item in items]
+    duration = items[-1]["start"]
+    boundaries = [duration * i / num_segments for i in range(num_segments)]
+
+    started = time.perf_counter()
+    old_texts = _segments_per_item_scan(items, boundaries, sentences, sentence_timestamps)
+    scan_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _, new_texts = timestamps_feature.build_segments(boundaries, index, sentences, sentence_timestamps)
+    bisect_time = time.perf_counter() - started
+
+    # The index drops the separator after a segment's last item
+    assert [text.rstrip(" ") for text in old_texts] == new_texts
+    print(f"{num_items} items, {num_segments} segments | per-item scan: {scan_time * 1000:.1f} ms"
+          f" | bisect + slice: {bisect_time * 1000:.2f} ms ({scan_time / bisect_time:.0f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the YouTube NLP Assistant backend")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    summarize_parser = subparsers.add_parser("summarize", help="Chunk summarization throughput")
+    summarize_parser.add_argument("--chunks", type=int, default=8)
+    summarize_parser.add_argument("--chunk-words", type=int, default=800)
+    summarize_parser.add_argument("--batch-size", type=int, default=4)
+    summarize_parser.add_argument("--repeats", type=int, default=1)
+
+    key_terms_parser = subparsers.add_parser("key-terms", help="Key-term extraction over whole transcripts")
+    key_terms_parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    key_terms_parser.add_argument("--max-terms", type=int, default=24)
+    key_terms_parser.add_argument("--n-process", type=int, default=None,
+                                  help="spaCy worker processes (default: chosen from the input size)")
+
+    segments_parser = subparsers.add_parser("segments", help="Timestamp segment assembly on long transcripts")
+    segments_parser.add_argument("--items", type=int, default=100_000)
+    segments_parser.add_argument("--segments", type=int, default=12)
+
+    fast_summary_parser = subparsers.add_parser("fast-summary", help="Extractive fast summary latency")
+    fast_summary_parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 10_000, 100_000])
+    fast_summary_parser.add_argument("--repeats", type=int, default=3)
+    fast_summary_parser.add_argument("--abstractive", action="store_true", help="Also time the BART summary")
+
+    args = parser.parse_args()
+
+    if args.command == "summarize":
+        bench_summarize(args.chunks, args.chunk_words, args.batch_size, args.repeats)
+    elif args.command == "key-terms":
+        bench_key_terms(args.sizes, args.max_terms, args.n_process)
+    elif args.command == "segments":
+        bench_segments(args.items, args.segments)
+    elif args.command == "fast-summary":
+        bench_fast_summary(args.sizes, args.repeats, args.abstractive)
+
+if __name__ == "__main__":
+    main()
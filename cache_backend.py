@@ -0,0 +1,311 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+# Defaults, overridable through the environment
+DEFAULT_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite')
+DEFAULT_CACHE_DIR = os.environ.get('CACHE_DIR', 'cache')
+DEFAULT_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 256 * 1024 * 1024))
+DEFAULT_TTL_SECONDS = int(os.environ.get('CACHE_TTL', 7 * 24 * 3600))
+DEFAULT_CACHE_URL = os.environ.get('CACHE_URL', 'redis://localhost:6379/0')
+
+# SQLite reads record access times in memory and write them in one batch this often (or once this many are pending)
+ACCESS_FLUSH_SECONDS = 30
+ACCESS_FLUSH_BATCH = 256
+
+# SQLite writes between TTL sweeps and size checks (sooner if this process's estimate passes the cap)
+MAINTENANCE_INTERVAL_WRITES = 64
+
+def encode_value(value):
+    """Serialize a JSON-compatible value to compressed bytes."""
+    return zlib.compress(json.dumps(value).encode('utf-8'))
+
+def decode_value(data):
+    """Restore a value serialized by encode_value."""
+    return json.loads(zlib.decompress(data).decode('utf-8'))
+
+class CacheBackend:
+    """Base class for caches of JSON-compatible values with LRU/TTL eviction and a byte-size cap."""
+
+    def __init__(self, namespace, ttl=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, key):
+        raise NotImplementedError
+
+    def _store(self, key, data):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def _size_stats(self):
+        return {}
+
+    def _lookup(self, key):
+        """Load the raw value for key and count the hit or miss."""
+        data = self._load(key)
+        if data is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return data
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if it is missing or expired."""
+        data = self._lookup(key)
+        if data is None:
+            return default
+        return decode_value(data)
+
+    def set(self, key, value):
+        """Cache a JSON-compatible value under key."""
+        data = encode_value(value)
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            print(f"Not caching '{key}' in {self.namespace}: value larger than the cache size cap")
+            return
+        self._store(key, data)
+
+    def stats(self):
+        """Return hit/miss counters and size information."""
+        stats = {'backend': type(self).__name__, 'hits': self.hits, 'misses': self.misses}
+        stats.update(self._size_stats())
+        return stats
+
+    # Dict-style access so caches can stand in for plain dicts
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def __getitem__(self, key):
+        data = self._lookup(key)
+        if data is None:
+            raise KeyError(key)
+        return decode_value(data)
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        self.delete(key)
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache holding compressed values."""
+
+    def __init__(self, namespace, ttl=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(namespace, ttl, max_bytes)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _load(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, created = entry
+            if self.ttl is not None and time.time() - created > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return data
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def _store(self, key, data):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (data, time.time())
+            self._bytes += len(data)
+            while self.max_bytes is not None and self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _size_stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes}
+
+class SQLiteCache(CacheBackend):
+    """SQLite-file cache shared by every worker process and kept across restarts."""
+
+    def __init__(self, namespace, ttl=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES, cache_dir=DEFAULT_CACHE_DIR):
+        super().__init__(namespace, ttl, max_bytes)
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, f"{namespace}.sqlite3")
+        # sqlite3 connections cannot be shared between threads
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+            # Running estimate of the namespace size; writes from other processes are picked up at each size check
+            self._approx_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self._writes = 0
+        # Access times not yet written, so reads don't each need a write transaction
+        self._accessed = {}
+        self._last_access_flush = time.time()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _load(self, key):
+        row = self._connect().execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        data, created = row
+        now = time.time()
+        if self.ttl is not None and now - created > self.ttl:
+            # Deleted by the next TTL sweep
+            return None
+        
+        with self._lock:
+            self._accessed[key] = now
+            flush_due = (now - self._last_access_flush >= ACCESS_FLUSH_SECONDS
+                         or len(self._accessed) >= ACCESS_FLUSH_BATCH)
+        if flush_due:
+            self._flush_access_times()
+        return data
+
+    def _flush_access_times(self):
+        """Write the pending access times in one transaction."""
+        with self._lock:
+            pending = self._accessed
+            self._accessed = {}
+            self._last_access_flush = time.time()
+        if pending:
+            conn = self._connect()
+            with conn:
+                conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?",
+                                 [(accessed, key) for key, accessed in pending.items()])
+
+    def _store(self, key, data):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(data), len(data), now, now)
+            )
+        
+        with self._lock:
+            self._writes += 1
+            # Replacing an entry overcounts, which only brings the next size check forward
+            self._approx_bytes += len(data)
+            maintenance_due = (self._writes % MAINTENANCE_INTERVAL_WRITES == 0
+                               or (self.max_bytes is not None and self._approx_bytes > self.max_bytes))
+        if maintenance_due:
+            self._maintain(now)
+
+    def _maintain(self, now):
+        """Delete expired entries and evict down to the size cap."""
+        # Eviction order should reflect recent reads
+        self._flush_access_times()
+        conn = self._connect()
+        with conn:
+            if self.ttl is not None:
+                conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if self.max_bytes is not None and total > self.max_bytes:
+                total = self._evict(conn, total)
+        with self._lock:
+            self._approx_bytes = total
+
+    def _evict(self, conn, total):
+        """Delete least recently used entries until the total size fits under the cap; returns the new total."""
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        return total
+
+    def delete(self, key):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM entries")
+        with self._lock:
+            self._accessed = {}
+            self._approx_bytes = 0
+
+    def _size_stats(self):
+        count, total = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'entries': count, 'bytes': total, 'path': self.path}
+
+class NetworkCache(CacheBackend):
+    """Cache on a Redis-compatible server; eviction is left to the server's maxmemory policy."""
+
+    def __init__(self, namespace, ttl=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES, client=None, url=DEFAULT_CACHE_URL):
+        super().__init__(namespace, ttl, max_bytes)
+        if client is None:
+            # Optional dependency, only needed for the network backend
+            import redis
+            client = redis.Redis.from_url(url)
+        # Any object with get(key), set(key, value, ex=seconds) and delete(key) works,
+        # so a local stand-in can be passed for testing
+        self.client = client
+
+    def _full_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _load(self, key):
+        return self.client.get(self._full_key(key))
+
+    def _store(self, key, data):
+        self.client.set(self._full_key(key), data, ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self._full_key(key))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self._full_key('*')))
+        if keys:
+            self.client.delete(*keys)
+
+def create_cache(namespace, backend=None, **options):
+    """Create a cache for the given namespace using the configured backend."""
+    backend = backend or DEFAULT_BACKEND
+    if backend == 'memory':
+        return MemoryCache(namespace, **options)
+    if backend == 'sqlite':
+        return SQLiteCache(namespace, **options)
+    if backend == 'redis':
+        return NetworkCache(namespace, **options)
+    raise ValueError(f"Unknown cache backend '{backend}'")
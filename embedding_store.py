@@ -0,0 +1,179 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (Windows); only one process should use a cache directory there
+    fcntl = None
+
+# Sentences per encoder call when embedding unseen sentences
+DEFAULT_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', 64))
+
+# Videos whose embeddings stay in memory; set EMBEDDING_CACHE_DIR to also keep them on disk
+DEFAULT_MAX_VIDEOS = int(os.environ.get('EMBEDDING_CACHE_VIDEOS', 64))
+DEFAULT_CACHE_DIR = os.environ.get('EMBEDDING_CACHE_DIR')
+
+def sentence_key(sentence):
+    """Hash identifying a sentence's text."""
+    return hashlib.blake2b(sentence.encode('utf-8'), digest_size=16).hexdigest()
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path + '.lock' so processes sharing a cache directory take turns."""
+    with open(path + '.lock', 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+class VideoEmbeddings:
+    """float16 sentence embeddings of one video, with a row index keyed by sentence hash."""
+
+    def __init__(self, dim=None, path=None):
+        self.dim = dim
+        self.rows = {}
+        self.vectors = None
+        # Base path of the .keys/.f16 file pair on disk, or None for memory only
+        self.path = path
+        self.lock = threading.Lock()
+        if path is not None:
+            self._load()
+
+    def _load(self):
+        """Memory-map the rows already saved on disk."""
+        keys_path = self.path + '.keys'
+        vectors_path = self.path + '.f16'
+        # Another process may be mid-append; its rows must not be trimmed as an interrupted write
+        with file_lock(self.path):
+            if not os.path.exists(keys_path) or not os.path.exists(vectors_path):
+                return
+            with open(keys_path) as f:
+                keys = f.read().split()
+            # The first key line holds the dimension
+            if not keys:
+                return
+            dim = int(keys[0])
+            # Rows are written before their keys, so a partial write leaves extra rows, never missing ones
+            count = min(len(keys) - 1, os.path.getsize(vectors_path) // (dim * 2))
+            if count != len(keys) - 1 or os.path.getsize(vectors_path) != count * dim * 2:
+                # Trim an interrupted write so later appends stay aligned
+                os.truncate(vectors_path, count * dim * 2)
+                with open(keys_path, 'w') as f:
+                    f.write(f"{dim}\n" + ''.join(key + '\n' for key in keys[1:count + 1]))
+        if count == 0:
+            return
+        self.dim = dim
+        self.vectors = np.memmap(vectors_path, dtype=np.float16, mode='r', shape=(count, dim))
+        self.rows = {key: row for row, key in enumerate(keys[1:count + 1])}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, keys, vectors):
+        """Append float16 rows for new sentence keys."""
+        vectors = np.asarray(vectors, dtype=np.float16)
+        start = len(self.rows)
+        if self.vectors is None:
+            self.dim = vectors.shape[1]
+            self.vectors = vectors
+        else:
+            self.vectors = np.concatenate([self.vectors, vectors])
+        for offset, key in enumerate(keys):
+            self.rows[key] = start + offset
+
+        if self.path is not None:
+            keys_path = self.path + '.keys'
+            # Rows and keys are appended as a pair under the file lock, so two processes never interleave them
+            with file_lock(self.path):
+                # Another process may have created the files since they were loaded; append after its rows
+                new_file = not os.path.exists(keys_path) or os.path.getsize(keys_path) == 0
+                with open(self.path + '.f16', 'wb' if new_file else 'ab') as f:
+                    f.write(vectors.tobytes())
+                with open(keys_path, 'w' if new_file else 'a') as f:
+                    if new_file:
+                        f.write(f"{self.dim}\n")
+                    f.write(''.join(key + '\n' for key in keys))
+
+    def lookup(self, keys):
+        """Return the float32 embeddings for keys that are all present."""
+        return np.asarray(self.vectors[[self.rows[key] for key in keys]], dtype=np.float32)
+
+class EmbeddingStore:
+    """Per-video sentence embedding cache, so only sentences never seen before are encoded."""
+
+    def __init__(self, model_name, cache_dir=DEFAULT_CACHE_DIR, max_videos=DEFAULT_MAX_VIDEOS):
+        self.model_name = model_name
+        self.cache_dir = None
+        if cache_dir:
+            # Embeddings from different models must never mix
+            self.cache_dir = os.path.join(cache_dir, re.sub(r'[^\w.-]', '_', model_name))
+            os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_videos = max_videos
+        self._videos = OrderedDict()
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.reused = 0
+
+    def _get_video(self, video_id):
+        with self._lock:
+            video = self._videos.get(video_id)
+            if video is None:
+                path = None
+                if self.cache_dir is not None:
+                    path = os.path.join(self.cache_dir, re.sub(r'[^\w-]', '_', video_id))
+                video = VideoEmbeddings(path=path)
+                self._videos[video_id] = video
+            self._videos.move_to_end(video_id)
+            while self.max_videos is not None and len(self._videos) > self.max_videos:
+                self._videos.popitem(last=False)
+            return video
+
+    def encode(self, video_id, sentences, encoder, batch_size=DEFAULT_BATCH_SIZE):
+        """Return float32 embeddings for sentences, encoding only the ones not stored for this video."""
+        keys = [sentence_key(sentence) for sentence in sentences]
+        video = self._get_video(video_id)
+
+        with video.lock:
+            missing = {}
+            for key, sentence in zip(keys, sentences):
+                if key not in video.rows and key not in missing:
+                    missing[key] = sentence
+
+            if missing:
+                vectors = encoder.encode(list(missing.values()), batch_size=batch_size, convert_to_numpy=True)
+                video.add(list(missing.keys()), vectors)
+            self.encoded += len(missing)
+            self.reused += len(keys) - len(missing)
+
+            if not keys:
+                return np.zeros((0, video.dim or 0), dtype=np.float32)
+            return video.lookup(keys)
+
+    def invalidate(self, video_id=None):
+        """Drop one video (or every video) from memory; files on disk are kept."""
+        with self._lock:
+            if video_id is None:
+                self._videos.clear()
+            else:
+                self._videos.pop(video_id, None)
+
+    def stats(self):
+        """Return the number of videos and sentences held, and encode/reuse counters."""
+        with self._lock:
+            videos = list(self._videos.values())
+        return {
+            'videos': len(videos),
+            'sentences': sum(len(video) for video in videos),
+            'encoded': self.encoded,
+            'reused': self.reused,
+            'disk': self.cache_dir
+        }
@@ -0,0 +1,451 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import httplib2
+from googleapiclient.discovery import build
+from transformers import pipeline
+import model_registry
+import cache_backend
+
+# Comments scored together in one padded micro-batch
+SENTIMENT_BATCH_SIZE = int(os.environ.get('SENTIMENT_BATCH_SIZE', 32))
+
+# Comments are sorted by length within windows of this many micro-batches, so padding
+# stays small while a cut-off by the time budget still leaves an unbiased prefix
+SORT_WINDOW_BATCHES = 8
+
+# Per-request limits
+MAX_COMMENTS = int(os.environ.get('FACTCHECK_MAX_COMMENTS', 2000))
+TIME_BUDGET_SECONDS = float(os.environ.get('FACTCHECK_TIME_BUDGET', 20))
+
+# Comment pages fetched ahead of the page being scored
+PREFETCH_PAGES = 2
+
+# SQLite file with one row per scored comment and one row of running counts per video
+COMMENT_DB_PATH = os.environ.get('FACTCHECK_DB', os.path.join(cache_backend.DEFAULT_CACHE_DIR, 'comment_sentiment.sqlite3'))
+
+# Videos not checked for this long are dropped with their comments, as are the least recently
+# checked videos beyond the cap; both are enforced every MAINTENANCE_INTERVAL_SAVES saves
+COMMENT_RETENTION_SECONDS = int(os.environ.get('FACTCHECK_RETENTION', cache_backend.DEFAULT_TTL_SECONDS))
+MAX_STORED_VIDEOS = int(os.environ.get('FACTCHECK_MAX_VIDEOS', 10000))
+MAINTENANCE_INTERVAL_SAVES = 64
+
+class CommentStore:
+    """Scored comments stored one row each, so a repeat check reads and writes only what it touches."""
+
+    def __init__(self, path, retention=COMMENT_RETENTION_SECONDS, max_videos=MAX_STORED_VIDEOS):
+        self.path = path
+        self.retention = retention
+        self.max_videos = max_videos
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # sqlite3 connections cannot be shared between threads
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS comments ("
+                "video_id TEXT NOT NULL, comment_id TEXT NOT NULL, published TEXT NOT NULL, label TEXT NOT NULL, "
+                "PRIMARY KEY (video_id, comment_id)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS videos ("
+                "video_id TEXT PRIMARY KEY, positive INTEGER NOT NULL, negative INTEGER NOT NULL, "
+                "total INTEGER NOT NULL, sample TEXT NOT NULL, backfill_token TEXT, complete INTEGER NOT NULL, "
+                "checked REAL NOT NULL DEFAULT 0)"
+            )
+            # Stores created before retention existed lack the column; their videos count as checked now
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(videos)")]
+            if 'checked' not in columns:
+                conn.execute("ALTER TABLE videos ADD COLUMN checked REAL NOT NULL DEFAULT 0")
+                conn.execute("UPDATE videos SET checked = ?", (time.time(),))
+            conn.execute("CREATE INDEX IF NOT EXISTS videos_checked ON videos (checked)")
+        self._saves = 0
+        self._lock = threading.Lock()
+        self._prune(time.time())
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, video_id):
+        """Get a video's counts, sample and backfill cursor, or a fresh state if it was never checked."""
+        state = _new_state()
+        row = self._connect().execute(
+            "SELECT positive, negative, total, sample, backfill_token, complete FROM videos WHERE video_id = ?",
+            (video_id,)
+        ).fetchone()
+        if row is not None:
+            state['positive'], state['negative'], state['total'] = row[0], row[1], row[2]
+            state['sample'] = json.loads(row[3])
+            state['backfill_token'] = row[4]
+            state['complete'] = bool(row[5])
+        return state
+
+    def known_ids(self, video_id, comment_ids):
+        """Return which of the given comment IDs are already stored for the video."""
+        if not comment_ids:
+            return set()
+        placeholders = ','.join('?' * len(comment_ids))
+        rows = self._connect().execute(
+            f"SELECT comment_id FROM comments WHERE video_id = ? AND comment_id IN ({placeholders})",
+            [video_id, *comment_ids]
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def save(self, video_id, state):
+        """Insert the comments scored by this check and update the video's counts in one transaction."""
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO comments (video_id, comment_id, published, label) VALUES (?, ?, ?, ?)",
+                [(video_id, comment_id, published, label) for comment_id, (published, label) in state['scored'].items()]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO videos (video_id, positive, negative, total, sample, backfill_token, complete, "
+                "checked) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, state['positive'], state['negative'], state['total'], json.dumps(state['sample']),
+                 state['backfill_token'], int(state['complete']), now)
+            )
+        
+        with self._lock:
+            self._saves += 1
+            maintenance_due = self._saves % MAINTENANCE_INTERVAL_SAVES == 0
+        if maintenance_due:
+            self._prune(now)
+    
+    def _prune(self, now):
+        """Drop videos past the retention period or beyond the cap, least recently checked first, with their comments."""
+        conn = self._connect()
+        with conn:
+            stale = []
+            if self.retention is not None:
+                stale += conn.execute("SELECT video_id FROM videos WHERE checked < ?", (now - self.retention,)).fetchall()
+            if self.max_videos is not None:
+                stale += conn.execute(
+                    "SELECT video_id FROM videos ORDER BY checked DESC LIMIT -1 OFFSET ?", (self.max_videos,)
+                ).fetchall()
+            stale = list(set(stale))
+            if stale:
+                conn.executemany("DELETE FROM comments WHERE video_id = ?", stale)
+                conn.executemany("DELETE FROM videos WHERE video_id = ?", stale)
+        if stale:
+            print(f"Dropped stored comments of {len(stale)} videos")
+
+comment_store = CommentStore(COMMENT_DB_PATH)
+
+# YouTube Data API clients, built once per API key from the bundled discovery document
+_youtube_clients = {}
+_youtube_clients_lock = threading.Lock()
+
+# httplib2.Http objects are not thread-safe, so each page iteration checks one out of this pool;
+# idle objects keep their connections open for the next request
+_http_factory = httplib2.Http
+_http_pool = queue.LifoQueue()
+
+def get_youtube_client(api_key):
+    """Get the shared YouTube Data API client for an API key."""
+    with _youtube_clients_lock:
+        client = _youtube_clients.get(api_key)
+        if client is None:
+            client = build('youtube', 'v3', developerKey=api_key, static_discovery=True, cache_discovery=False)
+            _youtube_clients[api_key] = client
+        return client
+
+def set_http_factory(factory):
+    """Replace the function that creates HTTP transports (e.g. with googleapiclient.http.HttpMock) and drop pooled ones."""
+    global _http_factory
+    _http_factory = factory or httplib2.Http
+    while True:
+        try:
+            _http_pool.get_nowait()
+        except queue.Empty:
+            return
+
+def _acquire_http():
+    try:
+        return _http_pool.get_nowait()
+    except queue.Empty:
+        return _http_factory()
+
+def _release_http(http):
+    _http_pool.put(http)
+
+def create_sentiment_analyzer():
+    """Create the sentiment analysis pipeline."""
+    return pipeline("sentiment-analysis")
+
+# Load the classifier once per process and share it across requests
+model_registry.register_model("sentiment", create_sentiment_analyzer)
+
+def truncate_text(text, max_words=128):
+    """Truncate a comment to at most max_words words."""
+    words = text.split()
+    if len(words) > max_words:
+        return " ".join(words[:max_words])
+    return text
+
+def _comment_record(item):
+    """Pull the fields we keep from a commentThreads item."""
+    snippet = item["snippet"]["topLevelComment"]["snippet"]
+    return {
+        'id': item["id"],
+        'published': snippet.get("publishedAt", ""),
+        'text': snippet["textDisplay"]
+    }
+
+def iter_comment_pages(youtube, video_id, page_token=None):
+    """Yield (page_token, comments, next_page_token) for each page of comment threads, newest first."""
+    http = _acquire_http()
+    try:
+        while True:
+            request_comments = youtube.commentThreads().list(
+                part="snippet",
+                videoId=video_id,
+                textFormat="plainText",
+                order="time",
+                maxResults=100,
+                pageToken=page_token
+            )
+            response = request_comments.execute(http=http)
+            comments = [_comment_record(item) for item in response.get("items", [])]
+            next_page_token = response.get("nextPageToken")
+            yield page_token, comments, next_page_token
+            
+            if not next_page_token:
+                return
+            page_token = next_page_token
+    finally:
+        _release_http(http)
+
+# Marks the end of the pages in the prefetch queue
+_NO_MORE_PAGES = object()
+
+def prefetch_comment_pages(youtube, video_id, page_token=None, pages_ahead=PREFETCH_PAGES):
+    """Like iter_comment_pages, but a producer thread fetches up to pages_ahead pages while the caller works."""
+    pages = queue.Queue(maxsize=pages_ahead)
+    stop = threading.Event()
+    
+    def offer(item):
+        # Wait for room in the queue unless the consumer has gone away
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce():
+        try:
+            for page in iter_comment_pages(youtube, video_id, page_token):
+                if not offer(page):
+                    return
+            offer(_NO_MORE_PAGES)
+        except Exception as e:
+            # Handed to the consumer and raised there
+            offer(e)
+    
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is _NO_MORE_PAGES:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def score_comments(comments, batch_size=SENTIMENT_BATCH_SIZE, deadline=None):
+    """Score comments in length-sorted micro-batches; labels come back in input order (None if unscored)."""
+    analyzer = model_registry.get_model("sentiment")
+    truncated_comments = [truncate_text(comment) for comment in comments]
+    labels = [None] * len(comments)
+
+    window = batch_size * SORT_WINDOW_BATCHES
+    for window_start in range(0, len(comments), window):
+        indices = sorted(
+            range(window_start, min(window_start + window, len(comments))),
+            key=lambda i: len(truncated_comments[i])
+        )
+        for start in range(0, len(indices), batch_size):
+            # Always score at least one micro-batch, even if fetching used up the budget
+            scored_any = window_start > 0 or start > 0
+            if scored_any and deadline is not None and time.time() >= deadline:
+                print(f"Sentiment scoring stopped at the time budget after {window_start + start} comments")
+                return labels
+
+            batch = indices[start:start + batch_size]
+            # Truncation trims inputs beyond the model limit
+            results = analyzer([truncated_comments[i] for i in batch], truncation=True, batch_size=len(batch))
+            for i, result in zip(batch, results):
+                labels[i] = result['label']
+
+    return labels
+
+def _new_state():
+    """Empty per-video sentiment state."""
+    return {
+        # Comments scored by the current check, not yet saved: comment ID -> [publish time, sentiment label]
+        'scored': {},
+        'positive': 0,
+        'negative': 0,
+        'total': 0,
+        'sample': [],
+        # Page to resume from when older comments are still unscored (None = newest page)
+        'backfill_token': None,
+        'complete': False
+    }
+
+def _record_scored(state, comments, labels):
+    """Add scored comments to the state and update the running counts; returns how many were added."""
+    recorded = 0
+    for comment, label in zip(comments, labels):
+        if label is None:
+            continue
+        state['scored'][comment['id']] = [comment['published'], label]
+        state['total'] += 1
+        if label == 'POSITIVE':
+            state['positive'] += 1
+        elif label == 'NEGATIVE':
+            state['negative'] += 1
+        recorded += 1
+    return recorded
+
+def aggregate_sentiment(state):
+    """Turn the running sentiment counts into positive/negative percentages."""
+    total = state['total']
+    
+    return {
+        'positive_percentage': round((state['positive'] / total * 100), 2) if total > 0 else 0,
+        'negative_percentage': round((state['negative'] / total * 100), 2) if total > 0 else 0,
+        'total_comments': total
+    }
+
+def _known_ids(video_id, state, comments):
+    """IDs of the comments on a page that were scored before, by this check or an earlier one."""
+    ids = [comment['id'] for comment in comments]
+    return comment_store.known_ids(video_id, ids) | {i for i in ids if i in state['scored']}
+
+# Checks of the same video run one at a time, so two never score the same new comments or
+# overwrite each other's counts; video IDs are spread over a fixed set of locks
+_check_locks = [threading.Lock() for _ in range(64)]
+
+def _check_lock(video_id):
+    return _check_locks[hash(video_id) % len(_check_locks)]
+
+def _past(deadline):
+    return deadline is not None and time.time() >= deadline
+
+def check_video_comments(youtube, video_id, max_comments=MAX_COMMENTS, time_budget=TIME_BUDGET_SECONDS):
+    """Fetch and score only the comments not seen before, within the comment cap and time budget (None for no limit)."""
+    # Time spent waiting for another check of the video counts against the budget
+    deadline = time.time() + time_budget if time_budget is not None else None
+    with _check_lock(video_id):
+        return _check_video_comments(youtube, video_id, max_comments, deadline)
+
+def _check_video_comments(youtube, video_id, max_comments, deadline):
+    state = comment_store.load(video_id)
+    fetched = 0
+    recorded = 0
+    
+    # Comments posted since the last check: read newest first and stop at the first one already seen.
+    # Each page is scored while the producer fetches the next one. A complete scan that found no
+    # comments still needs this, or comments posted later would never be read.
+    if state['total'] or state['complete']:
+        new_texts = []
+        reached_seen = False
+        out_of_budget = False
+        for _, comments, _ in prefetch_comment_pages(youtube, video_id):
+            seen = _known_ids(video_id, state, comments)
+            new_comments = []
+            for comment in comments:
+                if comment['id'] in seen:
+                    reached_seen = True
+                    break
+                new_comments.append(comment)
+            new_comments = new_comments[:max_comments - fetched]
+            
+            if recorded and _past(deadline):
+                out_of_budget = True
+                break
+            labels = score_comments([c['text'] for c in new_comments], deadline=deadline)
+            page_recorded = _record_scored(state, new_comments, labels)
+            recorded += page_recorded
+            fetched += len(new_comments)
+            new_texts.extend(c['text'] for c in new_comments)
+            
+            if page_recorded < len(new_comments):
+                out_of_budget = True
+                break
+            if reached_seen or fetched >= max_comments:
+                break
+        else:
+            reached_seen = True
+        
+        state['sample'] = (new_texts + state['sample'])[:5]
+        
+        if not reached_seen or out_of_budget:
+            # Some new comments were left unscored, so rescan from the newest page next time
+            print(f"Leaving a gap of unscored comments for video {video_id}; will rescan")
+            state['backfill_token'] = None
+            state['complete'] = False
+    
+    # Older comments never scored (first check, or an earlier check ran out of budget)
+    if not state['complete'] and fetched < max_comments and not _past(deadline):
+        try:
+            for page_token, comments, next_page_token in prefetch_comment_pages(youtube, video_id,
+                                                                               state['backfill_token']):
+                known = _known_ids(video_id, state, comments)
+                unseen = [c for c in comments if c['id'] not in known]
+                capped = unseen[:max_comments - fetched]
+                
+                if recorded and _past(deadline):
+                    # Resume from this page next time
+                    state['backfill_token'] = page_token
+                    break
+                labels = score_comments([c['text'] for c in capped], deadline=deadline)
+                page_recorded = _record_scored(state, capped, labels)
+                recorded += page_recorded
+                fetched += len(capped)
+                if not state['sample']:
+                    state['sample'] = [c['text'] for c in capped[:5]]
+                
+                if page_recorded < len(unseen):
+                    # Cut off by the cap or the budget; already scored comments are skipped on resume
+                    state['backfill_token'] = page_token
+                    break
+                state['backfill_token'] = next_page_token
+                state['complete'] = next_page_token is None
+                if fetched >= max_comments or _past(deadline):
+                    break
+        except Exception as e:
+            # Page tokens can expire; fall back to rescanning from the newest page next time
+            print(f"Error resuming comment backfill for video {video_id}: {e}")
+            state['backfill_token'] = None
+            state['complete'] = False
+    
+    comment_store.save(video_id, state)
+    
+    if not state['total']:
+        return None
+    
+    return {
+        'sentiment': aggregate_sentiment(state),
+        'comments_sample': state['sample'],
+        'fetched_comments': fetched,
+        'new_comments': recorded,
+        'complete': state['complete']
+    }
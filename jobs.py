@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads running submitted jobs; more jobs than this wait in the queue
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+
+# Queued and running jobs accepted at once; further submissions are rejected
+MAX_ACTIVE_JOBS = int(os.environ.get('MAX_ACTIVE_JOBS', 32))
+
+# How long finished jobs stay available to poll
+JOB_RETENTION_SECONDS = float(os.environ.get('JOB_RETENTION_SECONDS', 3600))
+
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+
+class JobQueueFull(Exception):
+    """Raised when MAX_ACTIVE_JOBS jobs are already queued or running."""
+
+class Job:
+    """A unit of work run on the job executor, with its state, current stage and outcome."""
+
+    def __init__(self, kind, key):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        # Jobs for the same key share one run
+        self.key = key
+        self.state = 'queued'
+        self.stage = 'queued'
+        self.done = None
+        self.total = None
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.updated = self.created
+        self.finished = None
+        self.finished_event = threading.Event()
+        self.lock = threading.Lock()
+
+    def report(self, stage, done=None, total=None):
+        """Progress callback: record the current stage and, for counted stages, how far it got."""
+        with self.lock:
+            self.stage = stage
+            self.done = done
+            self.total = total
+            self.updated = time.time()
+
+    def wait(self, timeout=None):
+        """Wait up to timeout seconds for the job to finish; returns whether it has."""
+        return self.finished_event.wait(timeout)
+
+    def to_dict(self):
+        """Status of the job as returned by the status endpoint."""
+        with self.lock:
+            status = {
+                'jobId': self.id,
+                'kind': self.kind,
+                'state': self.state,
+                'stage': self.stage,
+                'progress': {'done': self.done, 'total': self.total},
+                'created': self.created,
+                'updated': self.updated
+            }
+            if self.state == 'done':
+                status['result'] = self.result
+            elif self.state == 'failed':
+                status['error'] = self.error
+        return status
+
+# Jobs by ID, and the unfinished job for each key
+_jobs = {}
+_active_jobs = {}
+_jobs_lock = threading.Lock()
+
+def _prune_finished(now):
+    """Forget finished jobs older than the retention period."""
+    expired = [job_id for job_id, job in _jobs.items()
+               if job.finished is not None and now - job.finished > JOB_RETENTION_SECONDS]
+    for job_id in expired:
+        del _jobs[job_id]
+
+def _run(job, fn):
+    with job.lock:
+        job.state = 'running'
+        job.stage = 'started'
+        job.updated = time.time()
+    try:
+        result = fn(job.report)
+        outcome = {'state': 'done', 'stage': 'done', 'result': result}
+    except Exception as e:
+        print(f"Job {job.id} ({job.kind}) failed: {e}")
+        outcome = {'state': 'failed', 'error': str(e)}
+
+    with _jobs_lock:
+        with job.lock:
+            for name, value in outcome.items():
+                setattr(job, name, value)
+            job.finished = job.updated = time.time()
+        if _active_jobs.get(job.key) is job:
+            del _active_jobs[job.key]
+    job.finished_event.set()
+
+def submit(kind, key, fn):
+    """Run fn(progress) on the job executor and return its Job; a key already queued or running returns that job."""
+    with _jobs_lock:
+        job = _active_jobs.get(key)
+        if job is not None:
+            return job
+
+        _prune_finished(time.time())
+        if len(_active_jobs) >= MAX_ACTIVE_JOBS:
+            raise JobQueueFull(f"Too many jobs in progress ({MAX_ACTIVE_JOBS}); try again later")
+
+        job = Job(kind, key)
+        _jobs[job.id] = job
+        _active_jobs[key] = job
+
+    job_executor.submit(_run, job, fn)
+    return job
+
+def get_job(job_id):
+    """Get a job by ID, or None if it is unknown or expired."""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def stats():
+    """Count tracked jobs by state."""
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+    counts = {'queued': 0, 'running': 0, 'done': 0, 'failed': 0}
+    for job in jobs:
+        counts[job.state] += 1
+    return counts
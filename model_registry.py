@@ -0,0 +1,83 @@
+import threading
+import time
+
+# Registered loader functions, keyed by model name
+_loaders = {}
+
+# Loaded model instances and their load state
+_models = {}
+_states = {}
+_errors = {}
+_load_times = {}
+
+# One lock per model so concurrent requests never load the same model twice
+_locks = {}
+_registry_lock = threading.Lock()
+
+STATE_NOT_LOADED = "not_loaded"
+STATE_LOADING = "loading"
+STATE_LOADED = "loaded"
+STATE_FAILED = "failed"
+
+def register_model(name, loader):
+    """Register a zero-argument loader function under the given model name."""
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+        _states.setdefault(name, STATE_NOT_LOADED)
+
+def get_model(name):
+    """Return the shared instance of a model, loading it on first use."""
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    if name not in _loaders:
+        raise KeyError(f"No model registered under '{name}'")
+
+    with _locks[name]:
+        # Another thread may have finished loading while we waited for the lock
+        model = _models.get(name)
+        if model is not None:
+            return model
+
+        print(f"Loading model '{name}'...")
+        _states[name] = STATE_LOADING
+        started = time.time()
+        try:
+            model = _loaders[name]()
+        except Exception as e:
+            _states[name] = STATE_FAILED
+            _errors[name] = str(e)
+            print(f"Failed to load model '{name}': {e}")
+            raise
+
+        _models[name] = model
+        _states[name] = STATE_LOADED
+        _errors.pop(name, None)
+        _load_times[name] = round(time.time() - started, 2)
+        print(f"Model '{name}' loaded in {_load_times[name]}s")
+        return model
+
+def warm_up(names=None):
+    """Eagerly load the given models (all registered models by default)."""
+    if names is None:
+        names = list(_loaders.keys())
+
+    for name in names:
+        try:
+            get_model(name)
+        except Exception as e:
+            print(f"Warning: could not warm up model '{name}': {e}")
+
+def get_load_state():
+    """Return the load state of every registered model."""
+    state = {}
+    for name in list(_loaders.keys()):
+        entry = {'state': _states.get(name, STATE_NOT_LOADED)}
+        if name in _load_times:
+            entry['load_seconds'] = _load_times[name]
+        if name in _errors:
+            entry['error'] = _errors[name]
+        state[name] = entry
+    return state
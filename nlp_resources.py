@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import OrderedDict
+import nltk
+from nltk.tokenize.punkt import PunktTokenizer
+import model_registry
+
+# NLTK data shipped with the repo (Punkt sentence tokenizers)
+NLTK_DATA_DIR = os.environ.get('NLTK_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
+
+SPACY_MODEL = "en_core_web_sm"
+
+# Texts per nlp.pipe batch, and worker processes for inputs of at least SPACY_PARALLEL_MIN_CHARS
+# characters; shorter inputs stay in-process, where starting workers would cost more than it saves
+SPACY_BATCH_SIZE = int(os.environ.get('SPACY_BATCH_SIZE', 64))
+SPACY_N_PROCESS = int(os.environ.get('SPACY_N_PROCESS', min(4, os.cpu_count() or 1)))
+SPACY_PARALLEL_MIN_CHARS = int(os.environ.get('SPACY_PARALLEL_MIN_CHARS', 200000))
+
+# Components each use can skip. POS tags alone need neither the parser nor NER;
+# noun chunks need the parser and tagger but not the lemmatizer
+POS_ONLY_DISABLED = ["parser", "ner", "lemmatizer"]
+NOUN_CHUNKS_DISABLED = ["ner", "lemmatizer"]
+
+# NER has its own embedding layer, so it runs without the shared tok2vec and the components after it
+NER_ONLY_DISABLED = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer"]
+
+def create_spacy_model():
+    """Load the spaCy pipeline with all components; callers disable what they don't need per call."""
+    import spacy
+    return spacy.load(SPACY_MODEL)
+
+# Load spaCy once per process and share it across features
+model_registry.register_model("spacy", create_spacy_model)
+
+def get_spacy():
+    """Get the shared spaCy pipeline, or None if spaCy or its model is unavailable."""
+    try:
+        return model_registry.get_model("spacy")
+    except ImportError:
+        print("spaCy not available. Using fallback methods.")
+    except OSError:
+        print("spaCy model not found. Using fallback methods.")
+    return None
+
+def n_process_for(text_length):
+    """Worker processes for running a text of text_length characters through nlp.pipe."""
+    return SPACY_N_PROCESS if text_length >= SPACY_PARALLEL_MIN_CHARS else 1
+
+def pipe(nlp, texts, disable=(), batch_size=SPACY_BATCH_SIZE, n_process=1):
+    """Run texts through nlp.pipe in one streaming pass with the given components disabled."""
+    return nlp.pipe(texts, disable=list(disable), batch_size=batch_size, n_process=n_process)
+
+# Punkt models bundled in nltk_data/tokenizers/punkt_tab, keyed by ISO 639-1 language code
+PUNKT_LANGUAGES = {
+    'cs': 'czech', 'da': 'danish', 'de': 'german', 'el': 'greek', 'en': 'english', 'es': 'spanish',
+    'et': 'estonian', 'fi': 'finnish', 'fr': 'french', 'it': 'italian', 'ml': 'malayalam', 'nb': 'norwegian',
+    'nl': 'dutch', 'no': 'norwegian', 'pl': 'polish', 'pt': 'portuguese', 'ru': 'russian', 'sl': 'slovene',
+    'sv': 'swedish', 'tr': 'turkish'
+}
+DEFAULT_PUNKT_LANGUAGE = 'english'
+
+# Loaded Punkt models kept in memory, least recently used evicted first (English is always kept)
+PUNKT_CACHE_SIZE = int(os.environ.get('PUNKT_CACHE_SIZE', 4))
+
+# NLTK resources, loaded once by bootstrap_nltk
+_sentence_tokenizer = None
+_stop_words = None
+_nltk_lock = threading.Lock()
+_punkt_tokenizers = OrderedDict()
+_punkt_lock = threading.Lock()
+
+def punkt_language(language_code):
+    """Map a transcript language code such as 'de' or 'pt-BR' to a bundled Punkt model name."""
+    if not language_code:
+        return DEFAULT_PUNKT_LANGUAGE
+    return PUNKT_LANGUAGES.get(language_code.split('-')[0].lower(), DEFAULT_PUNKT_LANGUAGE)
+
+def get_sentence_tokenizer(language_code=None):
+    """Get the Punkt tokenizer for a language code, loading it once; unknown languages use English."""
+    language = punkt_language(language_code)
+    if language == DEFAULT_PUNKT_LANGUAGE:
+        if _sentence_tokenizer is None:
+            bootstrap_nltk()
+        return _sentence_tokenizer
+    
+    with _punkt_lock:
+        tokenizer = _punkt_tokenizers.get(language)
+        if tokenizer is not None:
+            _punkt_tokenizers.move_to_end(language)
+            return tokenizer
+    
+    if _sentence_tokenizer is None:
+        bootstrap_nltk()
+    # Loaded outside the lock; if two threads race, both get a working tokenizer and one is kept
+    tokenizer = PunktTokenizer(language)
+    print(f"Loaded Punkt tokenizer for {language}")
+    
+    with _punkt_lock:
+        _punkt_tokenizers[language] = tokenizer
+        _punkt_tokenizers.move_to_end(language)
+        while len(_punkt_tokenizers) > PUNKT_CACHE_SIZE:
+            _punkt_tokenizers.popitem(last=False)
+    return tokenizer
+
+
+def _load_stop_words():
+    """English stopwords from NLTK, or scikit-learn's list when the corpus isn't installed."""
+    try:
+        from nltk.corpus import stopwords
+        return frozenset(stopwords.words('english'))
+    except LookupError:
+        # The stopwords corpus isn't bundled in nltk_data/; the list differs, so say which one is used
+        print(f"Warning: NLTK stopwords corpus not found in {NLTK_DATA_DIR}; using scikit-learn's English stop words")
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+        return frozenset(ENGLISH_STOP_WORDS)
+
+def bootstrap_nltk():
+    """Point NLTK at the bundled data and load the sentence tokenizer and stopwords; raises LookupError if missing."""
+    global _sentence_tokenizer, _stop_words
+    
+    with _nltk_lock:
+        if _sentence_tokenizer is not None:
+            return
+        if NLTK_DATA_DIR not in nltk.data.path:
+            nltk.data.path.insert(0, NLTK_DATA_DIR)
+        # Fails fast if the Punkt data can't be found; nothing is downloaded
+        tokenizer = PunktTokenizer('english')
+        _stop_words = _load_stop_words()
+        _sentence_tokenizer = tokenizer
+        print(f"NLTK resources loaded from {NLTK_DATA_DIR}")
+
+def sent_tokenize(text, language_code=None):
+    """Split text into sentences with the Punkt tokenizer for the given language code (English by default)."""
+    return get_sentence_tokenizer(language_code).tokenize(text)
+
+def get_stop_words():
+    """Get the preloaded English stopword set."""
+    if _stop_words is None:
+        bootstrap_nltk()
+    return _stop_words
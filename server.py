@@ -1,23 +1,522 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import youtube_summarizer
 import time
 import os
+import json
+import math
+import re
+import threading
+import model_registry
+import transcript_store
+import cache_backend
+import jobs
 
 # Import the timestamps feature
 import timestamps_feature
 
 # For fact check functionality
-from transformers import pipeline
-from googleapiclient.discovery import build
+import factcheck_feature
+
+# Load NLTK resources from the bundled nltk_data/ once; fails at startup if they are missing
+import nlp_resources
+nlp_resources.bootstrap_nltk()
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Create caches
-summary_cache = {}
-timestamps_cache = {}
-segment_cache = {}
+# Create caches (SQLite files under cache/ by default, see cache_backend)
+summary_cache = cache_backend.create_cache('summary')
+timestamps_cache = cache_backend.create_cache('timestamps')
+segment_cache = cache_backend.create_cache('segment')
+
+# Time kept free within a deadline for the fast extractive summary
+FAST_SUMMARY_RESERVE_SECONDS = float(os.environ.get('FAST_SUMMARY_RESERVE_MS', 250)) / 1000
+
+# Segment summary precompute runs (state, ready and total counts, job ID), keyed by video ID
+MAX_TRACKED_PRECOMPUTE_JOBS = 1000
+_precompute_jobs = {}
+_precompute_lock = threading.Lock()
+
+class APIError(Exception):
+    """Error raised by a shared computation that maps to an HTTP status code."""
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.status_code = status_code
+
+class _InFlightCall:
+    """A computation in progress that other callers can wait on."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+# Computations in progress, keyed by cache key
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+def join_flight(key):
+    """Return the in-flight call for key and whether this caller is its leader (and must finish it)."""
+    with _in_flight_lock:
+        call = _in_flight.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _InFlightCall()
+            _in_flight[key] = call
+    return call, is_leader
+
+def finish_flight(key, call):
+    """Release the waiters of a call whose leader has set its result or error."""
+    with _in_flight_lock:
+        _in_flight.pop(key, None)
+    call.done.set()
+
+def wait_for_flight(key, call):
+    """Wait for another caller's computation and return its result or raise its error."""
+    print(f"Waiting for in-flight computation of {key}")
+    call.done.wait()
+    if call.error is not None:
+        raise call.error
+    return call.result
+
+def single_flight(key, compute):
+    """Run compute() once for all concurrent callers with the same key and share the outcome."""
+    call, is_leader = join_flight(key)
+    if not is_leader:
+        return wait_for_flight(key, call)
+    
+    try:
+        call.result = compute()
+    except Exception as e:
+        # Errors reach every waiter but are never cached, so the next request retries
+        call.error = e
+        raise
+    finally:
+        finish_flight(key, call)
+    
+    return call.result
+
+def submit_job(kind, key, run):
+    """Start run(progress) as a background job and respond 202 with its ID (503 if too many jobs are active)."""
+    try:
+        job = jobs.submit(kind, key, run)
+    except jobs.JobQueueFull as e:
+        return jsonify({'status': 'error', 'error': str(e)}), 503
+    
+    print(f"Accepted {kind} job {job.id}")
+    return jsonify({
+        'status': 'accepted',
+        'jobId': job.id,
+        'state': job.state,
+        'statusUrl': f"/api/jobs/{job.id}"
+    }), 202
+
+def cached_summary(cache_key, quality='best'):
+    """Get a cached summary of at least the requested quality ('fast' is extractive, 'best' abstractive)."""
+    cached = summary_cache.get(cache_key)
+    # Entries from before quality levels existed are abstractive
+    if cached is not None and (quality == 'fast' or cached.get('quality', 'best') == 'best'):
+        return cached
+    if quality == 'fast':
+        # Fast summaries have their own key, so they can never overwrite the abstractive one
+        return summary_cache.get(f"fast_{cache_key}")
+    return None
+
+def compute_summary(video_id, min_length, max_length, progress=None):
+    """Summarize a video and cache the result."""
+    cache_key = f"{video_id}_{min_length}_{max_length}"
+    cached = cached_summary(cache_key)
+    if cached is not None:
+        return cached
+    
+    for event in iter_summary(video_id, min_length, max_length, progress):
+        if event['type'] == 'result':
+            return event['result']
+
+def iter_summary(video_id, min_length, max_length, progress=None, first_batch_size=None):
+    """Summarize a video, yielding each chunk event, then cache the result and yield {'type': 'result', ...}."""
+    youtube_url = f"https://www.youtube.com/watch?v={video_id}"
+    if not youtube_summarizer.extract_video_id(youtube_url):
+        raise APIError('Invalid YouTube URL. Please provide a valid URL.', 400)
+    
+    if progress is not None:
+        progress('transcript')
+    transcript = youtube_summarizer.get_transcript(video_id)
+    # Failures are raised so they are never cached
+    if not transcript:
+        raise APIError('Could not retrieve transcript. The video might not have captions.', 400)
+    
+    print(f"Generating summary (target length: {min_length}-{max_length} words)...")
+    chunk_stats = {}
+    for event in youtube_summarizer.summarize_text_stream(
+        transcript,
+        target_min_length=min_length,
+        target_max_length=max_length,
+        stats=chunk_stats,
+        progress=progress,
+        first_batch_size=first_batch_size
+    ):
+        if event['type'] == 'chunk':
+            yield event
+        else:
+            summary = event['summary']
+    
+    result = _summary_result(video_id, summary, transcript, chunk_stats)
+    summary_cache[f"{video_id}_{min_length}_{max_length}"] = result
+    yield {'type': 'result', 'result': result}
+
+def _summary_result(video_id, summary, transcript, chunk_stats):
+    """Build the response for a video summary."""
+    return {
+        'status': 'success',
+        'videoId': video_id,
+        'summary': summary,
+        'transcript': transcript,
+        'chunking': chunk_stats,
+        'quality': 'best',
+        'timestamp': time.time()
+    }
+
+def compute_tiered_summary(video_id, min_length, max_length, deadline):
+    """Return the abstractive summary if it is ready within deadline seconds, otherwise a fast extractive one."""
+    started = time.time()
+    cache_key = f"{video_id}_{min_length}_{max_length}"
+    flight_key = f"summary:{cache_key}"
+    
+    # The abstractive summary always runs to completion; once cached it is served instead of the fast one
+    try:
+        job = jobs.submit('summary', flight_key, lambda progress: single_flight(
+            flight_key,
+            lambda: compute_summary(video_id, min_length, max_length, progress)
+        ))
+    except jobs.JobQueueFull as e:
+        # The fast summary needs no job, so a full queue only means there is no upgrade this time
+        print(f"Not starting abstractive summary for {video_id}: {e}")
+        job = None
+    
+    # Event.wait overflows on timeouts beyond TIMEOUT_MAX
+    wait = min(deadline - (time.time() - started) - FAST_SUMMARY_RESERVE_SECONDS, threading.TIMEOUT_MAX)
+    if job is not None and wait > 0 and job.wait(wait) and job.state == 'done':
+        return job.result
+    
+    result = cached_summary(cache_key, 'fast')
+    if result is None:
+        transcript = youtube_summarizer.get_transcript(video_id)
+        if not transcript:
+            raise APIError('Could not retrieve transcript. The video might not have captions.', 400)
+        
+        result = {
+            'status': 'success',
+            'videoId': video_id,
+            'summary': youtube_summarizer.extractive_summary(transcript, min_length, max_length),
+            'transcript': transcript,
+            'quality': 'fast',
+            'timestamp': time.time()
+        }
+        summary_cache[f"fast_{cache_key}"] = result
+    
+    if result.get('quality') == 'fast' and job is not None:
+        result = dict(result)
+        result['upgradeJobId'] = job.id
+        result['statusUrl'] = f"/api/jobs/{job.id}"
+    return result
+
+def finish_summary_in_background(cache_key, stream, flight_key, call):
+    """Run the rest of an abandoned summary stream as a job that then finishes its flight; False if the queue is full."""
+    def run(progress):
+        try:
+            for event in stream:
+                if event['type'] == 'result':
+                    call.result = event['result']
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            finish_flight(flight_key, call)
+    
+    try:
+        # Keyed on the call, which stays referenced until the job is done, so it never joins an older job
+        jobs.submit('summary', f"summary-stream:{cache_key}:{id(call)}", run)
+        return True
+    except jobs.JobQueueFull as e:
+        stream.close()
+        call.error = APIError(str(e), 503)
+        return False
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def compute_timestamps(video_id, progress=None):
+    """Generate timestamps for a video and cache the result."""
+    cached = timestamps_cache.get(video_id)
+    if cached is not None:
+        return cached
+    
+    try:
+        has_transcript = len(transcript_store.get_transcript_index(video_id)) > 0
+    except Exception as e:
+        print(f"Error fetching transcript: {e}")
+        raise APIError('Could not retrieve transcript', 400)
+    if not has_transcript:
+        raise APIError('No transcript found for this video', 404)
+    
+    print(f"Generating timestamps for video {video_id}...")
+    # Errors are raised rather than replaced by a placeholder, so the placeholder is never cached
+    timestamps = timestamps_feature.generate_timestamps(video_id, progress=progress, fallback_on_error=False)
+    
+    result = {
+        'status': 'success',
+        'videoId': video_id,
+        'timestamps': timestamps,
+        'timestamp': time.time()
+    }
+    
+    timestamps_cache[video_id] = result
+    return result
+
+def compute_segment_summary(video_id, segment_id):
+    """Summarize one timestamp segment of a video and cache the result."""
+    cache_key = f"{video_id}_{segment_id}"
+    cached = segment_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    timestamps = single_flight(f"timestamps:{video_id}", lambda: compute_timestamps(video_id))['timestamps']
+    
+    if segment_id >= len(timestamps) or segment_id < 0:
+        raise APIError('Invalid segment ID', 400)
+    
+    current = timestamps[segment_id]
+    next_time = timestamps[segment_id + 1]["time"] if segment_id + 1 < len(timestamps) else None
+    
+    segment_text = timestamps_feature.get_segment_transcript(
+        video_id, 
+        current["time"], 
+        next_time
+    )
+    
+    if not segment_text.strip():
+        raise APIError('No transcript found for this segment', 404)
+    
+    summary = youtube_summarizer.summarize_text(
+        segment_text,
+        target_min_length=30,
+        target_max_length=100
+    )
+    
+    result = _segment_result(video_id, segment_id, current, summary)
+    segment_cache[cache_key] = result
+    return result
+
+def _segment_result(video_id, segment_id, segment, summary):
+    """Build the response for one segment summary."""
+    return {
+        'status': 'success',
+        'videoId': video_id,
+        'segmentId': segment_id,
+        'summary': summary,
+        'timestamp': segment["time"],
+        'formatted_time': segment["formatted_time"],
+        'title': segment["title"]
+    }
+
+def precompute_segment_summaries(video_id, timestamps, progress=None):
+    """Summarize every segment from the already loaded transcript and fill the segment cache."""
+    report = progress or (lambda stage, done=None, total=None: None)
+    start_times = [ts["time"] for ts in timestamps]
+    segment_texts = timestamps_feature.get_segment_transcripts(video_id, start_times)
+    
+    # Segments without transcript text have nothing to summarize
+    summarizable = [i for i, text in enumerate(segment_texts) if text.strip()]
+    pending = [i for i in summarizable if f"{video_id}_{i}" not in segment_cache]
+    ready = len(summarizable) - len(pending)
+    
+    def update(ready):
+        with _precompute_lock:
+            _precompute_jobs[video_id].update({'ready': ready, 'total': len(summarizable)})
+        report('segments', ready, len(summarizable))
+    
+    update(ready)
+    print(f"Precomputing {len(pending)} segment summaries for video {video_id}...")
+    
+    # Segments share the flights of /api/segment_summary, so a segment is never summarized twice;
+    # those already being summarized by a request are waited for at the end
+    others = []
+    batch_size = youtube_summarizer.DEFAULT_BATCH_SIZE
+    for start in range(0, len(pending), batch_size):
+        group = []
+        for i in pending[start:start + batch_size]:
+            flight_key = f"segment:{video_id}_{i}"
+            call, is_leader = join_flight(flight_key)
+            if not is_leader:
+                others.append((flight_key, call))
+            elif f"{video_id}_{i}" in segment_cache:
+                # Finished just before this flight was joined
+                call.result = segment_cache.get(f"{video_id}_{i}")
+                finish_flight(flight_key, call)
+                ready += 1
+            else:
+                group.append((i, flight_key, call))
+        
+        # Summarize in batch-sized groups so the ready count grows as results come in
+        try:
+            summaries = youtube_summarizer.summarize_texts(
+                [segment_texts[i] for i, _, _ in group],
+                target_min_length=30,
+                target_max_length=100,
+                batch_size=batch_size
+            )
+            for (i, _, call), summary in zip(group, summaries):
+                call.result = _segment_result(video_id, i, timestamps[i], summary)
+                segment_cache[f"{video_id}_{i}"] = call.result
+        except Exception as e:
+            for _, _, call in group:
+                call.error = e
+            raise
+        finally:
+            for _, flight_key, call in group:
+                finish_flight(flight_key, call)
+        ready += len(group)
+        update(ready)
+    
+    for flight_key, call in others:
+        try:
+            wait_for_flight(flight_key, call)
+            ready += 1
+        except Exception as e:
+            print(f"Segment summary {flight_key} failed: {e}")
+        update(ready)
+
+def start_segment_precompute(video_id, timestamps):
+    """Start precomputing segment summaries as a background job unless a run is active or complete."""
+    with _precompute_lock:
+        entry = _precompute_jobs.get(video_id)
+        if entry and (entry['state'] == 'running' or (entry['state'] == 'done' and entry['ready'] >= entry['total'])):
+            return
+        
+        # Forget finished runs so the table stays small; their results live in segment_cache
+        if len(_precompute_jobs) >= MAX_TRACKED_PRECOMPUTE_JOBS:
+            for finished in [v for v, j in _precompute_jobs.items() if j['state'] != 'running']:
+                del _precompute_jobs[finished]
+        
+        _precompute_jobs[video_id] = {'state': 'running', 'ready': 0, 'total': len(timestamps)}
+    
+    def run(progress):
+        try:
+            precompute_segment_summaries(video_id, timestamps, progress)
+            state = {'state': 'done'}
+        except Exception as e:
+            print(f"Error precomputing segment summaries for video {video_id}: {e}")
+            state = {'state': 'failed', 'error': str(e)}
+        with _precompute_lock:
+            _precompute_jobs[video_id].update(state)
+        return dict(state, videoId=video_id)
+    
+    try:
+        job = jobs.submit('segment_summaries', f"segments:{video_id}", run)
+        state = {'jobId': job.id}
+    except jobs.JobQueueFull as e:
+        state = {'state': 'failed', 'error': str(e)}
+    with _precompute_lock:
+        _precompute_jobs[video_id].update(state)
+
+def segment_summary_status(video_id, timestamps):
+    """Report how many segment summaries of a video the precompute run has made ready."""
+    with _precompute_lock:
+        entry = dict(_precompute_jobs.get(video_id, {}))
+    
+    status = {
+        'state': entry.get('state', 'not_started'),
+        'ready': entry.get('ready', 0),
+        'total': entry.get('total', len(timestamps))
+    }
+    for name in ('jobId', 'error'):
+        if name in entry:
+            status[name] = entry[name]
+    return status
+
+def with_segment_summaries(video_id, result, precompute_segments):
+    """Optionally start precomputing segment summaries, and add their status to a timestamps result."""
+    # Summarizing every segment in the background makes clicks hit the cache
+    if precompute_segments:
+        start_segment_precompute(video_id, result['timestamps'])
+    if precompute_segments or video_id in _precompute_jobs:
+        result = dict(result)
+        result['segmentSummaries'] = segment_summary_status(video_id, result['timestamps'])
+    return result
+
+def compute_keypoints(video_id):
+    """Extract key points from a video summary and cache the result."""
+    cache_key = f"keypoints_{video_id}"
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    youtube_url = f"https://www.youtube.com/watch?v={video_id}"
+    summary, transcript = youtube_summarizer.summarize_youtube_video(
+        youtube_url, 
+        min_length=100, 
+        max_length=200
+    )
+    
+    if transcript is None:
+        raise APIError(summary, 400)
+    if not summary:
+        raise APIError('Could not generate summary from transcript', 400)
+    
+    sentences = re.split(r'(?<=[.!?])\s+', summary)
+    key_points = [s.strip() for s in sentences if len(s.strip()) > 20]
+    
+    result = {
+        'status': 'success',
+        'videoId': video_id,
+        'keyPoints': key_points,
+        'timestamp': time.time()
+    }
+    
+    summary_cache[cache_key] = result
+    return result
+
+def compute_keypoints_wiki(video_id, num_terms, progress=None):
+    """Extract key terms with Wikipedia context and cache the result."""
+    cache_key = f"keypoints_wiki_{video_id}_{num_terms}"
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    if progress is not None:
+        progress('transcript')
+    try:
+        transcript = transcript_store.get_transcript_text(video_id)
+        print(f"Retrieved transcript with {len(transcript.split())} words")
+    except Exception as e:
+        print(f"Error fetching transcript: {e}")
+        raise APIError('Could not retrieve transcript', 400)
+    
+    import wikipedia_integration
+    print(f"Generating {num_terms} key terms with Wikipedia information...")
+    
+    key_terms = wikipedia_integration.generate_key_points_with_wikipedia(
+        transcript, 
+        max_terms=num_terms,
+        progress=progress
+    )
+    
+    print(f"Generated {len(key_terms)} key terms")
+    if len(key_terms) < num_terms:
+        print(f"Warning: Only generated {len(key_terms)} terms, expected {num_terms}")
+    
+    result = {
+        'status': 'success',
+        'videoId': video_id,
+        'keyPoints': key_terms,
+        'timestamp': time.time()
+    }
+    
+    summary_cache[cache_key] = result
+    return result
 
 @app.route('/api/summarize', methods=['POST', 'OPTIONS'])
 def summarize_video():
@@ -29,34 +528,54 @@ def summarize_video():
     if not video_id:
         return jsonify({'error': 'No video ID provided'}), 400
 
+    quality = data.get('quality', 'best')
+    if quality not in ('fast', 'best'):
+        return jsonify({'error': "quality must be 'fast' or 'best'"}), 400
+    # A fast request never waits for the abstractive summary; a deadline only applies to best
+    deadline_ms = data.get('deadlineMs')
+    deadline = 0
+    if deadline_ms is not None:
+        try:
+            deadline_ms = float(deadline_ms)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'deadlineMs must be a number'}), 400
+        if not math.isfinite(deadline_ms):
+            return jsonify({'error': 'deadlineMs must be finite'}), 400
+        if quality == 'best':
+            deadline = deadline_ms / 1000
+    
     cache_key = f"{video_id}_{data.get('minLength', 150)}_{data.get('maxLength', 300)}"
-    if cache_key in summary_cache:
+    cached = cached_summary(cache_key)
+    if cached is not None:
         print(f"Using cached summary for video {video_id}")
-        return jsonify(summary_cache[cache_key])
-    
-    youtube_url = f"https://www.youtube.com/watch?v={video_id}"
+        return jsonify(cached)
     
     try:
         min_length = int(data.get('minLength', 150))
         max_length = int(data.get('maxLength', 300))
+        flight_key = f"summary:{video_id}_{min_length}_{max_length}"
         
-        summary, transcript = youtube_summarizer.summarize_youtube_video(
-            youtube_url, 
-            min_length=min_length, 
-            max_length=max_length
-        )
+        # A fast request, or one with a deadline, gets the best summary ready in time;
+        # the abstractive summary then finishes in the background
+        if quality == 'fast' or deadline_ms is not None:
+            return jsonify(compute_tiered_summary(video_id, min_length, max_length, deadline))
         
-        result = {
-            'status': 'success',
-            'videoId': video_id,
-            'summary': summary,
-            'transcript': transcript,
-            'timestamp': time.time()
-        }
+        # With async, respond with a job ID right away and let the client poll /api/jobs/<id>
+        if data.get('async'):
+            return submit_job('summary', flight_key, lambda progress: single_flight(
+                flight_key,
+                lambda: compute_summary(video_id, min_length, max_length, progress)
+            ))
         
-        summary_cache[cache_key] = result
+        result = single_flight(flight_key, lambda: compute_summary(video_id, min_length, max_length))
         return jsonify(result)
     
+    except APIError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    
+    except jobs.JobQueueFull as e:
+        return jsonify({'status': 'error', 'error': str(e)}), 503
+    
     except Exception as e:
         error_response = {
             'status': 'error',
@@ -65,6 +584,83 @@ def summarize_video():
         }
         return jsonify(error_response), 500
 
+@app.route('/api/summarize_stream', methods=['POST', 'OPTIONS'])
+def summarize_video_stream():
+    if request.method == 'OPTIONS':
+        return '', 200
+        
+    data = request.json
+    video_id = data.get('videoId')
+    if not video_id:
+        return jsonify({'error': 'No video ID provided'}), 400
+    
+    try:
+        min_length = int(data.get('minLength', 150))
+        max_length = int(data.get('maxLength', 300))
+    except (TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'videoId': video_id, 'error': str(e)}), 400
+    
+    cache_key = f"{video_id}_{min_length}_{max_length}"
+    
+    def events():
+        cached = cached_summary(cache_key)
+        if cached is not None:
+            print(f"Using cached summary for video {video_id}")
+            yield sse_event('summary', cached)
+            return
+        
+        # Streams and /api/summarize for the same key share one run; late callers only get the final summary
+        flight_key = f"summary:{cache_key}"
+        call, is_leader = join_flight(flight_key)
+        if not is_leader:
+            try:
+                yield sse_event('summary', wait_for_flight(flight_key, call))
+            except Exception as e:
+                yield sse_event('error', {'status': 'error', 'videoId': video_id, 'error': str(e)})
+            return
+        
+        handed_off = False
+        try:
+            # Another run may have finished between the cache check and joining the flight
+            call.result = cached_summary(cache_key)
+            if call.result is None:
+                # Each chunk summary is sent as soon as its batch finishes, then the final summary;
+                # the first batch holds a single chunk so the first one arrives after one chunk's work
+                stream = iter_summary(video_id, min_length, max_length, first_batch_size=1)
+                for event in stream:
+                    if event['type'] == 'result':
+                        call.result = event['result']
+                        continue
+                    try:
+                        yield sse_event('chunk', {
+                            'videoId': video_id,
+                            'index': event['index'],
+                            'total': event['total'],
+                            'summary': event['summary']
+                        })
+                    except GeneratorExit:
+                        # The client went away; a job finishes the summary for the callers waiting on it
+                        handed_off = finish_summary_in_background(cache_key, stream, flight_key, call)
+                        return
+            
+            yield sse_event('summary', call.result)
+        
+        except Exception as e:
+            print(f"Error streaming summary: {e}")
+            call.error = e
+            yield sse_event('error', {'status': 'error', 'videoId': video_id, 'error': str(e)})
+        
+        finally:
+            if not handed_off:
+                finish_flight(flight_key, call)
+    
+    # Disable proxy buffering so each event reaches the client as it is produced
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/timestamps', methods=['POST', 'OPTIONS'])
 def generate_video_timestamps():
     if request.method == 'OPTIONS':
@@ -75,23 +671,29 @@ def generate_video_timestamps():
     if not video_id:
         return jsonify({'error': 'No video ID provided'}), 400
     
-    if video_id in timestamps_cache:
-        print(f"Using cached timestamps for video {video_id}")
-        return jsonify(timestamps_cache[video_id])
+    precompute_segments = bool(data.get('precomputeSegments', False))
     
     try:
-        print(f"Generating timestamps for video {video_id}...")
-        timestamps = timestamps_feature.generate_timestamps(video_id)
-        
-        result = {
-            'status': 'success',
-            'videoId': video_id,
-            'timestamps': timestamps,
-            'timestamp': time.time()
-        }
+        result = timestamps_cache.get(video_id)
+        if result is not None:
+            print(f"Using cached timestamps for video {video_id}")
+        elif data.get('async'):
+            return submit_job(
+                'timestamps',
+                f"timestamps:{video_id}:{precompute_segments}",
+                lambda progress: with_segment_summaries(
+                    video_id,
+                    single_flight(f"timestamps:{video_id}", lambda: compute_timestamps(video_id, progress)),
+                    precompute_segments
+                )
+            )
+        else:
+            result = single_flight(f"timestamps:{video_id}", lambda: compute_timestamps(video_id))
         
-        timestamps_cache[video_id] = result
-        return jsonify(result)
+        return jsonify(with_segment_summaries(video_id, result, precompute_segments))
+    
+    except APIError as e:
+        return jsonify({'error': str(e)}), e.status_code
     
     except Exception as e:
         print(f"Error generating timestamps: {e}")
@@ -115,63 +717,18 @@ def summarize_segment():
         return jsonify({'error': 'Missing required parameters'}), 400
     
     cache_key = f"{video_id}_{segment_id}"
-    if cache_key in segment_cache:
+    cached = segment_cache.get(cache_key)
+    if cached is not None:
         print(f"Using cached segment summary for video {video_id}, segment {segment_id}")
-        return jsonify(segment_cache[cache_key])
+        return jsonify(cached)
     
     try:
-        if video_id in timestamps_cache:
-            timestamps = timestamps_cache[video_id]['timestamps']
-        else:
-            timestamps = timestamps_feature.generate_timestamps(video_id)
-            timestamps_cache[video_id] = {
-                'status': 'success',
-                'videoId': video_id,
-                'timestamps': timestamps,
-                'timestamp': time.time()
-            }
-        
-        if segment_id >= len(timestamps) or segment_id < 0:
-            return jsonify({'error': 'Invalid segment ID'}), 400
-        
-        current = timestamps[segment_id]
-        next_time = timestamps[segment_id + 1]["time"] if segment_id + 1 < len(timestamps) else None
-        
-        segment_text = timestamps_feature.get_segment_transcript(
-            video_id, 
-            current["time"], 
-            next_time
-        )
-        
-        if not segment_text.strip():
-            return jsonify({'error': 'No transcript found for this segment'}), 404
-        
-        try:
-            summary = youtube_summarizer.summarize_text(
-                segment_text,
-                target_min_length=30,
-                target_max_length=100
-            )
-        except TypeError:
-            summary = youtube_summarizer.summarize_text(
-                segment_text,
-                min_length=30,
-                max_length=100
-            )
-        
-        result = {
-            'status': 'success',
-            'videoId': video_id,
-            'segmentId': segment_id,
-            'summary': summary,
-            'timestamp': current["time"],
-            'formatted_time': current["formatted_time"],
-            'title': current["title"]
-        }
-        
-        segment_cache[cache_key] = result
+        result = single_flight(f"segment:{cache_key}", lambda: compute_segment_summary(video_id, segment_id))
         return jsonify(result)
     
+    except APIError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    
     except Exception as e:
         error_response = {
             'status': 'error',
@@ -191,28 +748,18 @@ def extract_keypoints():
     if not video_id:
         return jsonify({'error': 'No video ID provided'}), 400
     
-    youtube_url = f"https://www.youtube.com/watch?v={video_id}"
+    cache_key = f"keypoints_{video_id}"
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
+        print(f"Using cached key points for video {video_id}")
+        return jsonify(cached)
     
     try:
-        summary, transcript = youtube_summarizer.summarize_youtube_video(
-            youtube_url, 
-            min_length=100, 
-            max_length=200
-        )
-        
-        if not summary:
-            return jsonify({'error': 'Could not generate summary from transcript'}), 400
-        
-        import re
-        sentences = re.split(r'(?<=[.!?])\s+', summary)
-        key_points = [s.strip() for s in sentences if len(s.strip()) > 20]
-        
-        return jsonify({
-            'status': 'success',
-            'videoId': video_id,
-            'keyPoints': key_points,
-            'timestamp': time.time()
-        })
+        result = single_flight(f"keypoints:{video_id}", lambda: compute_keypoints(video_id))
+        return jsonify(result)
+    
+    except APIError as e:
+        return jsonify({'error': str(e)}), e.status_code
     
     except Exception as e:
         return jsonify({
@@ -245,49 +792,24 @@ def extract_keypoints_with_wiki():
     num_terms = int(data.get('numTerms', 8))
     
     cache_key = f"keypoints_wiki_{video_id}_{num_terms}"
-    if cache_key in summary_cache:
+    cached = summary_cache.get(cache_key)
+    if cached is not None:
         print(f"Using cached wiki key terms for video {video_id}")
-        return jsonify(summary_cache[cache_key])
+        return jsonify(cached)
     
     try:
-        try:
-            import nltk
-            nltk.download('punkt')
-            nltk.download('stopwords')
-        except Exception as e:
-            print(f"Warning: NLTK download issue: {e}")
-        
-        from youtube_transcript_api import YouTubeTranscriptApi
-        try:
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-            transcript = ' '.join([item['text'] for item in transcript_list])
-            print(f"Retrieved transcript with {len(transcript.split())} words")
-        except Exception as e:
-            print(f"Error fetching transcript: {e}")
-            return jsonify({'error': 'Could not retrieve transcript'}), 400
+        if data.get('async'):
+            return submit_job('keypoints_wiki', cache_key, lambda progress: single_flight(
+                cache_key,
+                lambda: compute_keypoints_wiki(video_id, num_terms, progress)
+            ))
         
-        import wikipedia_integration
-        print(f"Generating {num_terms} key terms with Wikipedia information...")
-        
-        key_terms = wikipedia_integration.generate_key_points_with_wikipedia(
-            transcript, 
-            max_terms=num_terms
-        )
-        
-        print(f"Generated {len(key_terms)} key terms")
-        if len(key_terms) < num_terms:
-            print(f"Warning: Only generated {len(key_terms)} terms, expected {num_terms}")
-        
-        result = {
-            'status': 'success',
-            'videoId': video_id,
-            'keyPoints': key_terms,
-            'timestamp': time.time()
-        }
-        
-        summary_cache[cache_key] = result
+        result = single_flight(cache_key, lambda: compute_keypoints_wiki(video_id, num_terms))
         return jsonify(result)
     
+    except APIError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    
     except Exception as e:
         error_response = {
             'status': 'error',
@@ -306,6 +828,17 @@ def fact_check():
     video_id = data.get('videoId')
     if not video_id:
         return jsonify({'error': 'No video ID provided'}), 400
+    
+    # Requests may lower, but not raise or remove, the configured limits
+    try:
+        max_comments = int(data.get('maxComments', factcheck_feature.MAX_COMMENTS))
+        time_budget = float(data.get('timeBudget', factcheck_feature.TIME_BUDGET_SECONDS))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'maxComments and timeBudget must be numbers'}), 400
+    if not max_comments > 0 or not time_budget > 0:
+        return jsonify({'error': 'maxComments and timeBudget must be positive'}), 400
+    max_comments = min(max_comments, factcheck_feature.MAX_COMMENTS)
+    time_budget = min(time_budget, factcheck_feature.TIME_BUDGET_SECONDS)
 
     try:
         # Fetch comments using the YouTube Data API
@@ -313,67 +846,31 @@ def fact_check():
         if not api_key:
             raise Exception("YouTube API key not set. Please set the YOUTUBE_API_KEY environment variable.")
         
-        youtube = build('youtube', 'v3', developerKey=api_key)
-        comments = []
-        request_comments = youtube.commentThreads().list(
-            part="snippet",
-            videoId=video_id,
-            textFormat="plainText",
-            maxResults=100
-        )
-        response = request_comments.execute()
-        while response:
-            for item in response.get("items", []):
-                comment = item["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
-                comments.append(comment)
-            if "nextPageToken" in response:
-                request_comments = youtube.commentThreads().list(
-                    part="snippet",
-                    videoId=video_id,
-                    textFormat="plainText",
-                    maxResults=100,
-                    pageToken=response["nextPageToken"]
-                )
-                response = request_comments.execute()
-            else:
-                break
-        
-        if not comments:
+        youtube = factcheck_feature.get_youtube_client(api_key)
+        # Identical requests share one check; checks of one video with different limits take turns
+        flight_key = f"factcheck:{video_id}:{max_comments}:{time_budget}"
+        result = single_flight(flight_key, lambda: factcheck_feature.check_video_comments(
+            youtube,
+            video_id,
+            max_comments=max_comments,
+            time_budget=time_budget
+        ))
+        
+        if not result:
             return jsonify({
                 'status': 'error',
                 'videoId': video_id,
                 'error': 'No comments found for this video'
             }), 404
-
-        # Helper function to truncate comments by words (if desired)
-        def truncate_text(text, max_words=128):
-            words = text.split()
-            if len(words) > max_words:
-                return " ".join(words[:max_words])
-            return text
-
-        # Truncate each comment by words
-        truncated_comments = [truncate_text(comment) for comment in comments]
-
-        # Run sentiment analysis with truncation enabled so that inputs beyond the model limit are trimmed
-        sentiment_analyzer = pipeline("sentiment-analysis")
-        sentiments = sentiment_analyzer(truncated_comments, truncation=True)
-
-        pos_count = sum(1 for s in sentiments if s['label'] == 'POSITIVE')
-        neg_count = sum(1 for s in sentiments if s['label'] == 'NEGATIVE')
-        total = len(sentiments)
-        
-        aggregated = {
-            'positive_percentage': round((pos_count / total * 100), 2) if total > 0 else 0,
-            'negative_percentage': round((neg_count / total * 100), 2) if total > 0 else 0,
-            'total_comments': total
-        }
         
         return jsonify({
             'status': 'success',
             'videoId': video_id,
-            'sentiment': aggregated,
-            'comments_sample': comments[:5]
+            'sentiment': result['sentiment'],
+            'comments_sample': result['comments_sample'],
+            'fetched_comments': result['fetched_comments'],
+            'new_comments': result['new_comments'],
+            'complete': result['complete']
         })
     
     except Exception as e:
@@ -384,22 +881,36 @@ def fact_check():
             'error': str(e)
         }), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = jobs.get_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'error': 'Unknown or expired job ID'}), 404
+    
+    return jsonify(job.to_dict())
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'ok', 
-        'message': 'API is running'
+        'message': 'API is running',
+        'models': model_registry.get_load_state(),
+        'transcripts': transcript_store.get_store().stats(),
+        'chunk_summaries': youtube_summarizer.chunk_summary_cache.stats(),
+        'sentence_embeddings': timestamps_feature.sentence_embeddings.stats(),
+        'jobs': jobs.stats(),
+        'caches': {
+            'summary': summary_cache.stats(),
+            'timestamps': timestamps_cache.stats(),
+            'segment': segment_cache.stats()
+        }
     })
 
 if __name__ == '__main__':
-    os.makedirs('cache', exist_ok=True)
-    print("Setting up NLTK resources...")
-    try:
-        import timestamps_feature
-        timestamps_feature.ensure_nltk_data()
-    except Exception as e:
-        print(f"Warning: Error downloading NLTK resources: {e}")
-        print("Please run: python -m nltk.downloader punkt")
+    # Warm up models in the serving process only (the debug reloader's parent never serves)
+    if os.environ.get('WARM_UP_MODELS', '1') == '1' and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        print("Warming up models in the background...")
+        threading.Thread(target=model_registry.warm_up, daemon=True).start()
     
     print("Starting YouTube NLP API server...")
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+# Keep test caches in memory and any files out of the working tree
+os.environ.setdefault('CACHE_BACKEND', 'memory')
+os.environ.setdefault('CACHE_DIR', tempfile.mkdtemp(prefix='youtube-bot-tests-'))
+
+# The server modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
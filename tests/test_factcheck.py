@@ -0,0 +1,107 @@
+import pytest
+import factcheck_feature
+
+class FakeRequest:
+    def __init__(self, comments, page_token):
+        self.comments = comments
+        self.start = int(page_token or 0)
+
+    def execute(self, http=None):
+        page = self.comments[self.start:self.start + 100]
+        response = {'items': [
+            {'id': c['id'], 'snippet': {'topLevelComment': {'snippet': {'textDisplay': c['text'], 'publishedAt': ''}}}}
+            for c in page
+        ]}
+        if self.start + 100 < len(self.comments):
+            response['nextPageToken'] = str(self.start + 100)
+        return response
+
+class FakeYouTube:
+    """commentThreads().list(...) over an in-memory list of comments, newest first."""
+
+    def __init__(self):
+        self.comments = []
+
+    def post(self, count):
+        base = len(self.comments)
+        new = [{'id': f"c{base + i}", 'text': ('good' if (base + i) % 3 else 'bad') + f" comment {base + i}"}
+               for i in range(count)]
+        self.comments[:0] = list(reversed(new))
+
+    def commentThreads(self):
+        return self
+
+    def list(self, pageToken=None, **kwargs):
+        return FakeRequest(self.comments, pageToken)
+
+@pytest.fixture
+def youtube(monkeypatch):
+    monkeypatch.setattr(factcheck_feature, 'score_comments', lambda texts, deadline=None: [
+        'POSITIVE' if text.startswith('good') else 'NEGATIVE' for text in texts
+    ])
+    factcheck_feature.set_http_factory(lambda: None)
+    yield FakeYouTube()
+    factcheck_feature.set_http_factory(None)
+
+def test_repeat_checks_score_only_new_comments(youtube):
+    youtube.post(250)
+    first = factcheck_feature.check_video_comments(youtube, 'factcheck-repeat', time_budget=None)
+    assert first['new_comments'] == 250
+    assert first['complete']
+
+    youtube.post(30)
+    second = factcheck_feature.check_video_comments(youtube, 'factcheck-repeat', time_budget=None)
+    assert second['new_comments'] == 30
+    assert second['sentiment']['total_comments'] == 280
+
+    third = factcheck_feature.check_video_comments(youtube, 'factcheck-repeat', time_budget=None)
+    assert third['new_comments'] == 0
+    assert third['sentiment']['total_comments'] == 280
+
+def test_capped_checks_resume_the_backfill(youtube):
+    youtube.post(250)
+    first = factcheck_feature.check_video_comments(youtube, 'factcheck-resume', max_comments=120, time_budget=None)
+    assert first['sentiment']['total_comments'] == 120
+    assert not first['complete']
+
+    second = factcheck_feature.check_video_comments(youtube, 'factcheck-resume', time_budget=None)
+    assert second['new_comments'] == 130
+    assert second['complete']
+    positive = sum(1 for c in youtube.comments if c['text'].startswith('good'))
+    assert second['sentiment']['positive_percentage'] == round(positive / 250 * 100, 2)
+
+def test_comments_posted_after_an_empty_check_are_read(youtube):
+    assert factcheck_feature.check_video_comments(youtube, 'factcheck-empty', time_budget=None) is None
+
+    youtube.post(3)
+    result = factcheck_feature.check_video_comments(youtube, 'factcheck-empty', time_budget=None)
+
+    assert result is not None
+    assert result['new_comments'] == 3
+    assert result['sentiment']['total_comments'] == 3
+
+def test_store_drops_least_recently_checked_videos(tmp_path, monkeypatch):
+    monkeypatch.setattr(factcheck_feature, 'MAINTENANCE_INTERVAL_SAVES', 1)
+    store = factcheck_feature.CommentStore(str(tmp_path / 'comments.sqlite3'), max_videos=2)
+    for video_id in ('old', 'middle', 'new'):
+        state = factcheck_feature._new_state()
+        state['scored'] = {f"{video_id}-1": ['', 'POSITIVE']}
+        state['total'] = state['positive'] = 1
+        store.save(video_id, state)
+
+    assert store.load('old')['total'] == 0
+    assert store.known_ids('old', ['old-1']) == set()
+    assert store.load('new')['total'] == 1
+    assert store.known_ids('new', ['new-1']) == {'new-1'}
+
+def test_store_drops_videos_past_retention(tmp_path):
+    store = factcheck_feature.CommentStore(str(tmp_path / 'comments.sqlite3'), retention=60)
+    state = factcheck_feature._new_state()
+    state['scored'] = {'a-1': ['', 'NEGATIVE']}
+    state['total'] = state['negative'] = 1
+    store.save('a', state)
+
+    store._prune(factcheck_feature.time.time() + 120)
+
+    assert store.load('a')['total'] == 0
+    assert store.known_ids('a', ['a-1']) == set()
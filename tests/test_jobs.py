@@ -0,0 +1,71 @@
+import threading
+import pytest
+import jobs
+import server
+
+def blocking(release, result='done'):
+    """A job function that reports progress, then waits until released."""
+    def run(progress):
+        progress('working', 1, 2)
+        release.wait(5)
+        return result
+    return run
+
+def test_same_key_shares_one_job():
+    release = threading.Event()
+    first = jobs.submit('test', 'test:dedup', blocking(release))
+    second = jobs.submit('test', 'test:dedup', blocking(release, 'other'))
+    other = jobs.submit('test', 'test:dedup-other', blocking(release))
+
+    assert second is first
+    assert other is not first
+
+    release.set()
+    assert first.wait(5) and other.wait(5)
+    assert first.to_dict()['state'] == 'done'
+    assert first.result == 'done'
+    assert jobs.get_job(first.id) is first
+
+    # A finished job no longer absorbs new submissions
+    again = jobs.submit('test', 'test:dedup', blocking(release))
+    assert again is not first
+    assert again.wait(5)
+
+def test_progress_and_failure_are_reported():
+    release = threading.Event()
+    job = jobs.submit('test', 'test:progress', blocking(release))
+    for _ in range(100):
+        if job.to_dict()['stage'] == 'working':
+            break
+        release.wait(0.01)
+    status = job.to_dict()
+    assert status['stage'] == 'working'
+    assert status['progress'] == {'done': 1, 'total': 2}
+    release.set()
+    job.wait(5)
+
+    def fail(progress):
+        raise ValueError('broken')
+    failed = jobs.submit('test', 'test:failure', fail)
+    assert failed.wait(5)
+    assert failed.to_dict()['state'] == 'failed'
+    assert failed.to_dict()['error'] == 'broken'
+
+def test_full_queue_is_rejected(monkeypatch):
+    monkeypatch.setattr(jobs, 'MAX_ACTIVE_JOBS', 0)
+    with pytest.raises(jobs.JobQueueFull):
+        jobs.submit('test', 'test:full', lambda progress: None)
+
+def test_full_queue_returns_503(monkeypatch):
+    monkeypatch.setattr(jobs, 'MAX_ACTIVE_JOBS', 0)
+    client = server.app.test_client()
+    response = client.post('/api/summarize', json={'videoId': 'jobsTest503', 'async': True})
+    assert response.status_code == 503
+    assert response.get_json()['status'] == 'error'
+
+def test_job_status_endpoint():
+    job = jobs.submit('test', 'test:status', lambda progress: {'answer': 42})
+    job.wait(5)
+    client = server.app.test_client()
+    assert client.get(f"/api/jobs/{job.id}").get_json()['result'] == {'answer': 42}
+    assert client.get('/api/jobs/unknown').status_code == 404
@@ -0,0 +1,95 @@
+import pytest
+import youtube_summarizer
+
+class FakeTokenizer:
+    """One token per whitespace-separated word."""
+    model_max_length = 1024
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {'input_ids': [text.split() for text in texts]}
+
+class FakeSummarizer:
+    """Summarizes a chunk as its first word; inputs containing BAD always fail."""
+
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.calls = []
+
+    def __call__(self, inputs, **kwargs):
+        batch = [inputs] if isinstance(inputs, str) else list(inputs)
+        self.calls.append(batch)
+        if any('BAD' in text for text in batch):
+            raise RuntimeError('model error')
+        return [{'summary_text': f"summary of {text.split()[0]}"} for text in batch]
+
+@pytest.fixture(autouse=True)
+def empty_chunk_cache():
+    youtube_summarizer.chunk_summary_cache.clear()
+
+def test_chunks_respect_token_budget():
+    tokenizer = FakeTokenizer()
+    sentences = [f"Sentence {i} has " + "word " * (i % 7) + "end." for i in range(60)]
+    # A run-on caption longer than the budget is split into word pieces
+    text = ' '.join(sentences) + ' ' + ' '.join(['runon'] * 120)
+
+    chunks, token_counts, budget = youtube_summarizer.chunk_text_by_tokens(text, tokenizer, max_tokens=50)
+
+    assert budget == 50
+    assert len(chunks) > 1
+    assert all(count <= 50 for count in token_counts)
+    assert [len(chunk.split()) for chunk in chunks] == token_counts
+    # No text is lost or reordered
+    assert ' '.join(chunks).split() == text.split()
+
+def test_default_budget_leaves_room_for_special_tokens():
+    _, _, budget = youtube_summarizer.chunk_text_by_tokens("One. Two.", FakeTokenizer())
+    assert budget == youtube_summarizer.MODEL_MAX_TOKENS - 2
+
+def test_failing_chunk_does_not_fail_batch():
+    summarizer = FakeSummarizer()
+    chunks = ["alpha one.", "BAD chunk. Still bad.", "gamma three.", "delta four."]
+
+    summaries = youtube_summarizer.summarize_chunks(summarizer, chunks, max_length=20, min_length=5, batch_size=4)
+
+    assert summaries[0] == "summary of alpha"
+    assert summaries[2] == "summary of gamma"
+    assert summaries[3] == "summary of delta"
+    # The bad chunk falls back to its own sentences
+    assert summaries[1] == "BAD chunk. Still bad."
+    # One batched call, then each chunk of the failed batch on its own, then one retry
+    assert summarizer.calls[0] == chunks
+    assert len(summarizer.calls) == 1 + len(chunks) + 1
+
+def test_cached_chunk_summaries_are_reused():
+    summarizer = FakeSummarizer()
+    chunks = ["alpha one.", "beta two.", "BAD chunk."]
+    first = youtube_summarizer.summarize_chunks(summarizer, chunks, max_length=20, min_length=5, batch_size=2)
+
+    summarizer.calls.clear()
+    second = youtube_summarizer.summarize_chunks(summarizer, chunks, max_length=20, min_length=5, batch_size=2)
+
+    assert second == first
+    # Only the failed chunk's fallback was not cached, so only it goes back to the model
+    assert all(batch == ["BAD chunk."] for batch in summarizer.calls)
+
+def test_cache_is_keyed_on_generation_parameters():
+    summarizer = FakeSummarizer()
+    youtube_summarizer.summarize_chunks(summarizer, ["alpha one."], max_length=20, min_length=5)
+
+    summarizer.calls.clear()
+    youtube_summarizer.summarize_chunks(summarizer, ["alpha one."], max_length=40, min_length=5)
+
+    assert summarizer.calls == [["alpha one."]]
+
+def test_first_batch_can_be_smaller():
+    summarizer = FakeSummarizer()
+    chunks = [f"chunk{i} text." for i in range(6)]
+
+    done = [i for i, _ in youtube_summarizer.iter_chunk_summaries(summarizer, chunks, max_length=20, min_length=5,
+                                                                   batch_size=4, first_batch_size=1)]
+
+    assert sorted(done) == list(range(6))
+    assert [len(batch) for batch in summarizer.calls] == [1, 4, 1]
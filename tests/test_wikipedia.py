@@ -0,0 +1,90 @@
+import threading
+import time
+import pytest
+import wikipedia_integration
+
+class FakeWikipedia:
+    """Lookup backend that finds a distinct article for every term after a delay."""
+
+    def __init__(self, delays=None, titles=None, default_delay=0.05):
+        self.delays = delays or {}
+        self.titles = titles or {}
+        self.default_delay = default_delay
+        self.looked_up = []
+        self._lock = threading.Lock()
+
+    def __call__(self, term, max_length):
+        with self._lock:
+            self.looked_up.append(term)
+        time.sleep(self.delays.get(term, self.default_delay))
+        title = self.titles.get(term, term.title())
+        if title is None:
+            return None
+        return {'title': title, 'summary': f"About {term}.", 'url': f"https://example.org/{term}"}
+
+@pytest.fixture
+def wikipedia():
+    def install(backend):
+        wikipedia_integration.set_lookup_backend(backend, use_cache=False)
+        return backend
+    yield install
+    wikipedia_integration.set_lookup_backend(None)
+
+def test_rate_limiter_spaces_calls():
+    limiter = wikipedia_integration.RateLimiter(50)
+    calls = []
+
+    def call():
+        limiter.acquire()
+        calls.append(time.monotonic())
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The first call goes straight through and the other five wait one interval each
+    assert time.monotonic() - started >= 5 * 0.02 * 0.9
+    calls.sort()
+    assert all(later - earlier >= 0.02 * 0.9 for earlier, later in zip(calls, calls[1:]))
+
+def test_rate_limiter_without_limit_never_waits():
+    limiter = wikipedia_integration.RateLimiter(0)
+    started = time.monotonic()
+    for _ in range(100):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.05
+
+def test_lookups_stop_once_enough_articles_are_found(wikipedia):
+    backend = wikipedia(FakeWikipedia())
+    terms = [f"term{i}" for i in range(40)]
+
+    hits = wikipedia_integration.lookup_terms(terms, 3)
+
+    assert [term for term, _ in hits] == ["term0", "term1", "term2"]
+    # Lookups still queued at that point are cancelled or skipped
+    time.sleep(0.2)
+    assert len(backend.looked_up) < len(terms) // 2
+
+def test_lookup_progress_counts_articles_found(wikipedia):
+    wikipedia(FakeWikipedia(titles={'miss': None}))
+    reports = []
+
+    hits = wikipedia_integration.lookup_terms(['alpha', 'miss', 'beta'], 5,
+                                              lambda stage, done, total: reports.append((stage, done, total)))
+
+    assert [term for term, _ in hits] == ['alpha', 'beta']
+    assert reports[-1] == ('wikipedia', 2, 5)
+
+def test_shared_article_goes_to_the_better_ranked_term(wikipedia):
+    # The lower-ranked synonym resolves first, in an earlier batch
+    wikipedia(FakeWikipedia(
+        delays={'Albert Einstein': 0.3, 'Einstein': 0.0},
+        titles={'Albert Einstein': 'Albert Einstein', 'Einstein': 'Albert Einstein', 'nothing': None}
+    ))
+
+    hits = wikipedia_integration.lookup_terms(['Albert Einstein', 'nothing', 'Einstein', 'Relativity'], 2)
+
+    assert [term for term, _ in hits] == ['Albert Einstein', 'Relativity']
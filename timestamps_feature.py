@@ -1,45 +1,23 @@
-import nltk
-from youtube_transcript_api import YouTubeTranscriptApi
+import transcript_store
+import nlp_resources
+import embedding_store
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+from scipy import sparse
 from collections import Counter
+from bisect import bisect_left, bisect_right
 import re
-import os
-import sys
 
 # Global variables for models
 sentence_transformer = None
-nlp = None
+SENTENCE_MODEL = 'all-MiniLM-L6-v2'
 
-def ensure_nltk_data():
-    """Ensure all required NLTK data is properly downloaded."""
-    print("Setting up NLTK data path...")
-    # Add current directory to NLTK data path
-    nltk_data_dir = os.path.join(os.getcwd(), 'nltk_data')
-    os.makedirs(nltk_data_dir, exist_ok=True)
-    nltk.data.path.insert(0, nltk_data_dir)
-    
-    # Download punkt to our specified directory
-    print(f"Downloading punkt to {nltk_data_dir}")
-    nltk.download('punkt', download_dir=nltk_data_dir, quiet=False)
-    
-    # Add punkt_tab download
-    print(f"Downloading punkt_tab to {nltk_data_dir}")
-    nltk.download('punkt_tab', download_dir=nltk_data_dir, quiet=False)
-    
-    # Verify the download worked
-    try:
-        nltk.data.find('tokenizers/punkt')
-        print("NLTK punkt tokenizer is available!")
-        return True
-    except LookupError:
-        print("Failed to find punkt tokenizer even after download attempt")
-        return False
+# Sentence embeddings per video, so regenerating timestamps doesn't re-encode the transcript
+sentence_embeddings = embedding_store.EmbeddingStore(SENTENCE_MODEL)
 
 def load_models():
     """Load all required NLP models."""
-    global sentence_transformer, nlp
+    global sentence_transformer
     
     # Only load models if they're not already loaded
     if sentence_transformer is None:
@@ -47,22 +25,10 @@ def load_models():
             # Load Sentence Transformer for better semantic similarity
             from sentence_transformers import SentenceTransformer
             print("Loading SentenceTransformer model...")
-            sentence_transformer = SentenceTransformer('all-MiniLM-L6-v2')
+            sentence_transformer = SentenceTransformer(SENTENCE_MODEL)
             print("SentenceTransformer model loaded successfully")
         except ImportError:
             print("SentenceTransformer not available. Using fallback TF-IDF.")
-    
-    if nlp is None:
-        try:
-            # Load spaCy for better text processing
-            import spacy
-            print("Loading spaCy model...")
-            nlp = spacy.load("en_core_web_sm")
-            print("spaCy model loaded successfully")
-        except ImportError:
-            print("spaCy not available. Using fallback tokenization.")
-        except OSError:
-            print("spaCy model not found. Using fallback tokenization.")
 
 def segment_transcript_by_silence(transcript_items, min_silence_duration=1.0):
     """Find natural breaks in the transcript based on pauses in speech."""
@@ -87,21 +53,97 @@ def segment_transcript_by_silence(transcript_items, min_silence_duration=1.0):
     
     return silence_boundaries
 
-def calculate_sentence_embeddings(sentences):
+def align_sentences(full_text, sentences, max_gap=200):
+    """Find the start offset of each sentence with one forward pass over full_text."""
+    positions = []
+    cursor = 0
+    
+    for sentence in sentences:
+        # Sentences appear in order, so only search a bounded window after the previous one.
+        # This keeps the pass linear and maps repeated sentences to the right occurrence.
+        pos = full_text.find(sentence, cursor, cursor + len(sentence) + max_gap)
+        if pos == -1:
+            positions.append(None)
+        else:
+            positions.append(pos)
+            cursor = pos + len(sentence)
+    
+    return positions
+
+def calculate_sentence_embeddings(sentences, video_id=None):
     """Calculate embeddings for each sentence using Sentence Transformers."""
     global sentence_transformer
     
     if sentence_transformer is not None:
-        return sentence_transformer.encode(sentences)
+        if video_id is not None:
+            # Only sentences not embedded before for this video are encoded
+            return sentence_embeddings.encode(video_id, sentences, sentence_transformer)
+        return sentence_transformer.encode(sentences, batch_size=embedding_store.DEFAULT_BATCH_SIZE)
     else:
         # Fallback to TF-IDF if sentence transformers not available
         vectorizer = TfidfVectorizer()
         return vectorizer.fit_transform(sentences).toarray()
 
-def segment_by_topic_shifts(sentences, sentence_timestamps):
+def _window_bounds(num_sentences, window_size):
+    """Get [start, end) sentence bounds of the two windows compared at each position."""
+    positions = np.arange(num_sentences - window_size)
+    first_start = positions
+    first_end = positions + window_size
+    second_start = first_end
+    # The second window is cut short near the end of the transcript
+    second_end = np.minimum(positions + window_size * 2, num_sentences)
+    return first_start, first_end, second_start, second_end
+
+def _window_mean_operator(starts, ends, num_columns):
+    """Build a sparse matrix whose product with a row matrix averages each [start, end) window."""
+    counts = ends - starts
+    indptr = np.concatenate(([0], np.cumsum(counts)))
+    indices = np.arange(indptr[-1]) - np.repeat(indptr[:-1] - starts, counts)
+    data = np.repeat(1.0 / counts, counts)
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(starts), num_columns))
+
+def _rowwise_cosine(first, second):
+    """Cosine similarity between matching rows of two matrices (0 where a row is all zeros)."""
+    if sparse.issparse(first):
+        dots = np.asarray(first.multiply(second).sum(axis=1)).ravel()
+        norms = np.sqrt(np.asarray(first.multiply(first).sum(axis=1)).ravel() *
+                        np.asarray(second.multiply(second).sum(axis=1)).ravel())
+    else:
+        dots = np.einsum('ij,ij->i', first, second)
+        norms = np.linalg.norm(first, axis=1) * np.linalg.norm(second, axis=1)
+    
+    similarities = np.zeros(len(dots))
+    np.divide(dots, norms, out=similarities, where=norms > 0)
+    return similarities
+
+def window_similarities(vectors, window_size=3):
+    """Compute the similarity between every pair of adjacent sentence windows in one batched pass."""
+    num_sentences = vectors.shape[0]
+    if num_sentences <= window_size:
+        return np.zeros(0)
+    
+    first_start, first_end, second_start, second_end = _window_bounds(num_sentences, window_size)
+    
+    if sparse.issparse(vectors):
+        # Average sparse TF-IDF rows with a banded averaging operator
+        vectors = vectors.tocsr()
+        first_avg = _window_mean_operator(first_start, first_end, num_sentences) @ vectors
+        second_avg = _window_mean_operator(second_start, second_end, num_sentences) @ vectors
+    else:
+        # Sum dense embeddings with cumulative sums; cosine similarity is scale
+        # invariant, so window sums stand in for window means
+        vectors = np.asarray(vectors)
+        cumulative = np.zeros((num_sentences + 1, vectors.shape[1]))
+        np.cumsum(vectors, axis=0, out=cumulative[1:])
+        first_avg = cumulative[window_size:num_sentences] - cumulative[:num_sentences - window_size]
+        second_avg = cumulative[second_end] - cumulative[window_size:num_sentences]
+    
+    return _rowwise_cosine(first_avg, second_avg)
+
+def segment_by_topic_shifts(sentences, sentence_timestamps, window_size=3, threshold=0.5, video_id=None):
     """Identify topic shifts using semantic similarity between sentence windows."""
-    window_size = 3  # Number of sentences in each window
-    threshold = 0.5  # Similarity threshold for topic change
+    # window_size: number of sentences in each window
+    # threshold: similarity below which a local dip counts as a topic change
     
     if len(sentences) <= window_size * 2:
         # Too few sentences for meaningful segmentation
@@ -111,48 +153,21 @@ def segment_by_topic_shifts(sentences, sentence_timestamps):
         # Get sentence embeddings
         if sentence_transformer is not None:
             # Using SentenceTransformer
-            embeddings = sentence_transformer.encode(sentences)
-            
-            # Calculate similarity between consecutive windows
-            similarities = []
-            for i in range(len(sentences) - window_size):
-                window1 = embeddings[i:i+window_size]
-                window2 = embeddings[i+window_size:i+window_size*2]
-                
-                # Average the embeddings in each window
-                window1_avg = np.mean(window1, axis=0)
-                window2_avg = np.mean(window2, axis=0)
-                
-                # Calculate cosine similarity
-                similarity = np.dot(window1_avg, window2_avg) / (np.linalg.norm(window1_avg) * np.linalg.norm(window2_avg))
-                similarities.append(similarity)
+            vectors = calculate_sentence_embeddings(sentences, video_id)
         else:
             # Fallback to TF-IDF
             vectorizer = TfidfVectorizer(stop_words='english')
             vectors = vectorizer.fit_transform(sentences)
-            
-            # Calculate similarity between consecutive windows
-            similarities = []
-            for i in range(len(sentences) - window_size):
-                window1 = vectors[i:i+window_size]
-                window2 = vectors[i+window_size:i+window_size*2]
-                
-                # Average the vectors in each window
-                window1_avg = window1.mean(axis=0)
-                window2_avg = window2.mean(axis=0)
-                
-                # Calculate cosine similarity
-                similarity = cosine_similarity(window1_avg, window2_avg)[0, 0]
-                similarities.append(similarity)
         
-        # Find boundaries (points of low similarity)
-        topic_boundaries = [0]  # Always include the start
-        for i in range(1, len(similarities)):
-            if similarities[i] < threshold and similarities[i] < similarities[i-1]:
-                # Topic change at the start of the second window
-                boundary_idx = i + window_size
-                if boundary_idx < len(sentences):
-                    topic_boundaries.append(boundary_idx)
+        # Calculate similarity between consecutive windows
+        similarities = window_similarities(vectors, window_size)
+        
+        # Find boundaries (local dips below the threshold)
+        dips = np.nonzero((similarities[1:] < threshold) & (similarities[1:] < similarities[:-1]))[0] + 1
+        # Topic change at the start of the second window
+        boundary_indices = dips + window_size
+        boundary_indices = boundary_indices[boundary_indices < len(sentences)]
+        topic_boundaries = [0] + [int(idx) for idx in boundary_indices]  # Always include the start
         
         # Always include the end
         if len(sentences) - 1 not in topic_boundaries:
@@ -172,39 +187,29 @@ def segment_by_topic_shifts(sentences, sentence_timestamps):
             boundaries.append(len(sentences) - 1)
         return boundaries
 
-def extract_keywords(segment_text, num_keywords=3):
-    """Extract the most important keywords from text."""
-    global nlp
+def _keywords_from_doc(doc, num_keywords):
+    """Pick keywords from a spaCy doc: frequent nouns and proper nouns, then verbs."""
+    # Extract nouns and proper nouns as potential keywords
+    potential_keywords = []
+    for token in doc:
+        if token.pos_ in ('NOUN', 'PROPN') and not token.is_stop and len(token.text) > 3:
+            potential_keywords.append(token.text.lower())
     
-    if nlp is not None:
-        try:
-            # Use spaCy for better keyword extraction
-            doc = nlp(segment_text)
-            
-            # Extract nouns and proper nouns as potential keywords
-            potential_keywords = []
-            for token in doc:
-                if token.pos_ in ('NOUN', 'PROPN') and not token.is_stop and len(token.text) > 3:
-                    potential_keywords.append(token.text.lower())
-            
-            # Count occurrences and get top keywords
-            keyword_counts = Counter(potential_keywords)
-            keywords = [word for word, _ in keyword_counts.most_common(num_keywords)]
-            
-            # If we don't have enough keywords, add important verbs
-            if len(keywords) < num_keywords:
-                verbs = [token.text.lower() for token in doc if token.pos_ == 'VERB' and not token.is_stop and len(token.text) > 3]
-                verb_counts = Counter(verbs)
-                for word, _ in verb_counts.most_common(num_keywords - len(keywords)):
-                    keywords.append(word)
-                    
-            return keywords[:num_keywords]  # Ensure we don't return more than requested
-        
-        except Exception as e:
-            print(f"Error with spaCy keyword extraction: {e}")
-            # Fall through to the fallback method
+    # Count occurrences and get top keywords
+    keyword_counts = Counter(potential_keywords)
+    keywords = [word for word, _ in keyword_counts.most_common(num_keywords)]
     
-    # Fallback: simple TF-IDF
+    # If we don't have enough keywords, add important verbs
+    if len(keywords) < num_keywords:
+        verbs = [token.text.lower() for token in doc if token.pos_ == 'VERB' and not token.is_stop and len(token.text) > 3]
+        verb_counts = Counter(verbs)
+        for word, _ in verb_counts.most_common(num_keywords - len(keywords)):
+            keywords.append(word)
+            
+    return keywords[:num_keywords]  # Ensure we don't return more than requested
+
+def _fallback_keywords(segment_text, num_keywords):
+    """Pick keywords by plain word frequency."""
     try:
         # Remove common stop words
         stop_words = {"the", "a", "an", "and", "or", "but", "is", "are", "was", "were", "this", "that", 
@@ -223,17 +228,78 @@ def extract_keywords(segment_text, num_keywords=3):
         print(f"Error with fallback keyword extraction: {e}")
         return ["keyword"] * min(num_keywords, 3)  # Return placeholder keywords
 
-def generate_timestamps(video_id, min_segment_duration=20, max_segments=12):
-    """Generate high-precision timestamps with content-based segmentation."""
-    # Ensure NLTK resources are available
-    ensure_nltk_data()
+def extract_keywords_batch(segment_texts, num_keywords=3):
+    """Extract keywords for many texts in one spaCy pass; returns one keyword list per text."""
+    nlp = nlp_resources.get_spacy()
+    
+    if nlp is not None:
+        try:
+            # Keywords only need POS tags, so the parser and NER are skipped
+            docs = nlp_resources.pipe(nlp, segment_texts, disable=nlp_resources.POS_ONLY_DISABLED)
+            return [_keywords_from_doc(doc, num_keywords) for doc in docs]
+        
+        except Exception as e:
+            print(f"Error with spaCy keyword extraction: {e}")
+            # Fall through to the fallback method
+    
+    return [_fallback_keywords(text, num_keywords) for text in segment_texts]
+
+def extract_keywords(segment_text, num_keywords=3):
+    """Extract the most important keywords from text."""
+    return extract_keywords_batch([segment_text], num_keywords)[0]
+
+def build_segments(boundaries, index, sentences, sentence_timestamps):
+    """Build the timestamp entries (without keywords) and the text of each segment from sorted boundary times."""
+    # Item and sentence start times are sorted, so each segment is found with two bisects
+    timestamps = []
+    segment_texts = []
+    
+    for i, start_time in enumerate(boundaries):
+        # Get the end time for this segment
+        end_time = boundaries[i+1] if i < len(boundaries)-1 else None
+        
+        # Format time for display
+        minutes = int(start_time // 60)
+        seconds = int(start_time % 60)
+        formatted_time = f"{minutes}:{seconds:02d}"
+        
+        # Find transcript in this segment
+        segment_text = index.text_between(start_time, end_time)
+        
+        # Title from the first sentence in this segment
+        title = f"Segment at {formatted_time}"
+        if segment_text.strip():
+            first = bisect_left(sentence_timestamps, start_time)
+            if first < len(sentences) and (end_time is None or sentence_timestamps[first] < end_time):
+                title = sentences[first]
+                if len(title) > 50:
+                    title = title[:47] + "..."
+        
+        timestamps.append({
+            "time": start_time,
+            "formatted_time": formatted_time,
+            "title": title,
+            "keywords": [],
+            "segment_id": i
+        })
+        segment_texts.append(segment_text)
+    
+    return timestamps, segment_texts
+
+def generate_timestamps(video_id, min_segment_duration=20, max_segments=12, window_size=3, similarity_threshold=0.5,
+                        progress=None, fallback_on_error=True):
+    """Generate high-precision timestamps with content-based segmentation (errors raise if fallback_on_error is False)."""
+    # Stages are reported as progress(stage): transcript, sentences, segmentation, keywords
+    report = progress or (lambda stage, done=None, total=None: None)
     
     # Load NLP models if available
     load_models()
     
     try:
-        # Get the transcript
-        transcript_items = YouTubeTranscriptApi.get_transcript(video_id)
+        # Get the transcript, indexed by start time, from the shared store
+        report('transcript')
+        index = transcript_store.get_transcript_index(video_id)
+        transcript_items = index.items
         
         if not transcript_items:
             return [{
@@ -248,23 +314,15 @@ def generate_timestamps(video_id, min_segment_duration=20, max_segments=12):
         silence_boundaries = segment_transcript_by_silence(transcript_items)
         silence_times = [b['time'] for b in silence_boundaries if b['duration'] > 1.5]
         
-        # Convert transcript to text with mapping to timestamps
-        full_text = ""
-        time_mapping = {}
-        char_pos = 0
-        
-        for item in transcript_items:
-            text = item["text"] + " "
-            full_text += text
-            
-            # Map each character to its timestamp
-            for _ in range(len(text)):
-                time_mapping[char_pos] = item["start"]
-                char_pos += 1
+        # The index joins the items into one text with item offsets for timestamp lookups
+        full_text = index.text
         
         # Split the text into sentences
+        report('sentences')
         try:
-            sentences = nltk.sent_tokenize(full_text)
+            # Use the Punkt model for the transcript's language
+            language = transcript_store.get_transcript_language(video_id)
+            sentences = nlp_resources.sent_tokenize(full_text, language)
             print(f"Successfully tokenized into {len(sentences)} sentences")
         except Exception as e:
             print(f"Error with NLTK sentence tokenization: {e}")
@@ -279,17 +337,17 @@ def generate_timestamps(video_id, min_segment_duration=20, max_segments=12):
             interval = max(60, video_duration / 8)  # 8 segments max, minimum 60 seconds each
             
             timestamps = []
+            nearby_texts = []
             for i in range(min(8, max(3, int(video_duration / interval)))):
                 time_point = i * interval
                 minutes = int(time_point // 60)
                 seconds = int(time_point % 60)
                 formatted_time = f"{minutes}:{seconds:02d}"
                 
-                # Get text around this time point
-                nearby_text = ""
-                for item in transcript_items:
-                    if abs(item["start"] - time_point) < 30:  # 30 seconds around the time point
-                        nearby_text += item["text"] + " "
+                # Get text around this time point (30 seconds either side)
+                lo = bisect_right(index.starts, time_point - 30)
+                hi = bisect_left(index.starts, time_point + 30)
+                nearby_text = index.items_text(lo, hi)
                 
                 title = f"Segment {i+1}"
                 if nearby_text:
@@ -301,19 +359,22 @@ def generate_timestamps(video_id, min_segment_duration=20, max_segments=12):
                     "time": time_point,
                     "formatted_time": formatted_time,
                     "title": title,
-                    "keywords": extract_keywords(nearby_text),
+                    "keywords": [],
                     "segment_id": i
                 })
+                nearby_texts.append(nearby_text)
+            
+            # Extract keywords for all segments in one pass
+            for timestamp, keywords in zip(timestamps, extract_keywords_batch(nearby_texts)):
+                timestamp["keywords"] = keywords
             
             return timestamps
         
         # Store the timestamp for the start of each sentence
         sentence_timestamps = []
-        for sentence in sentences:
-            # Find position of first character of the sentence in full_text
-            start_pos = full_text.find(sentence)
-            if start_pos != -1:
-                timestamp = time_mapping.get(start_pos, 0)
+        for start_pos in align_sentences(full_text, sentences):
+            if start_pos is not None:
+                timestamp = index.time_at_offset(start_pos)
                 sentence_timestamps.append(timestamp)
             else:
                 # Fallback to previous timestamp if we can't find the sentence
@@ -321,7 +382,14 @@ def generate_timestamps(video_id, min_segment_duration=20, max_segments=12):
                 sentence_timestamps.append(timestamp)
         
         # Find topic boundaries using semantic analysis
-        topic_boundaries = segment_by_topic_shifts(sentences, sentence_timestamps)
+        report('segmentation')
+        topic_boundaries = segment_by_topic_shifts(
+            sentences,
+            sentence_timestamps,
+            window_size=window_size,
+            threshold=similarity_threshold,
+            video_id=video_id
+        )
         
         # Combine topic and silence boundaries
         all_boundary_times = []
@@ -361,60 +429,23 @@ def generate_timestamps(video_id, min_segment_duration=20, max_segments=12):
         filtered_boundaries.sort()
         
         # Generate timestamps for each segment
-        timestamps = []
+        timestamps, segment_texts = build_segments(
+            filtered_boundaries, index, sentences, sentence_timestamps
+        )
+        keyword_texts = [(i, text) for i, text in enumerate(segment_texts) if text.strip()]
         
-        for i in range(len(filtered_boundaries)):
-            start_time = filtered_boundaries[i]
-            
-            # Get the end time for this segment
-            end_time = filtered_boundaries[i+1] if i < len(filtered_boundaries)-1 else None
-            
-            # Format time for display
-            minutes = int(start_time // 60)
-            seconds = int(start_time % 60)
-            formatted_time = f"{minutes}:{seconds:02d}"
-            
-            # Find transcript in this segment
-            segment_text = ""
-            for item in transcript_items:
-                if item["start"] >= start_time and (end_time is None or item["start"] < end_time):
-                    segment_text += item["text"] + " "
-            
-            # Set title and keywords
-            if not segment_text.strip():
-                title = f"Segment at {formatted_time}"
-                keywords = []
-            else:
-                # Find sentences in this segment
-                segment_sentences = []
-                for j, timestamp in enumerate(sentence_timestamps):
-                    if timestamp >= start_time and (end_time is None or timestamp < end_time):
-                        if j < len(sentences):  # Ensure index is valid
-                            segment_sentences.append(sentences[j])
-                
-                # Get title from first sentence
-                if segment_sentences:
-                    title = segment_sentences[0]
-                    if len(title) > 50:
-                        title = title[:47] + "..."
-                else:
-                    title = f"Segment at {formatted_time}"
-                
-                # Extract keywords
-                keywords = extract_keywords(segment_text)
-            
-            timestamps.append({
-                "time": start_time,
-                "formatted_time": formatted_time,
-                "title": title,
-                "keywords": keywords,
-                "segment_id": i
-            })
+        # Extract keywords in one pass
+        report('keywords')
+        segment_keywords = extract_keywords_batch([text for _, text in keyword_texts])
+        for (i, _), keywords in zip(keyword_texts, segment_keywords):
+            timestamps[i]["keywords"] = keywords
         
         return timestamps
     
     except Exception as e:
         print(f"Error generating timestamps: {e}")
+        if not fallback_on_error:
+            raise
         # Provide a basic fallback
         return [{
             "time": 0,
@@ -427,20 +458,19 @@ def generate_timestamps(video_id, min_segment_duration=20, max_segments=12):
 def get_segment_transcript(video_id, start_time, end_time=None):
     """Get transcript text for a specific segment of the video."""
     try:
-        # Get full transcript
-        transcript_items = YouTubeTranscriptApi.get_transcript(video_id)
-        
-        # Filter transcript items for this segment
-        segment_items = []
-        for item in transcript_items:
-            # If this item is within our segment time range
-            if item["start"] >= start_time and (end_time is None or item["start"] < end_time):
-                segment_items.append(item)
-        
-        # Get text for this segment
-        segment_text = " ".join([item["text"] for item in segment_items])
-        
-        return segment_text
+        # Two bisects and one slice of the indexed transcript (built once per video in the shared store)
+        return transcript_store.get_transcript_index(video_id).text_between(start_time, end_time)
     except Exception as e:
         print(f"Error getting segment transcript: {e}")
-        return ""
\ No newline at end of file
+        return ""
+
+def get_segment_transcripts(video_id, start_times):
+    """Get transcript text for every segment, given the sorted segment start times."""
+    index = transcript_store.get_transcript_index(video_id)
+    
+    segment_texts = []
+    for i, start_time in enumerate(start_times):
+        end_time = start_times[i + 1] if i + 1 < len(start_times) else None
+        segment_texts.append(index.text_between(start_time, end_time))
+    
+    return segment_texts
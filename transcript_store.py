@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound
+
+# Keep transcripts for an hour and at most this many videos in memory
+DEFAULT_TTL_SECONDS = int(os.environ.get('TRANSCRIPT_CACHE_TTL', 3600))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('TRANSCRIPT_CACHE_SIZE', 256))
+
+# Transcript languages to prefer, in order; other languages are used when none of these exist
+PREFERRED_LANGUAGES = [code.strip() for code in os.environ.get('TRANSCRIPT_LANGUAGES', 'en').split(',') if code.strip()]
+
+# Language assumed when a fetcher doesn't report one
+DEFAULT_LANGUAGE = 'en'
+
+def fetch_from_youtube(video_id):
+    """Default fetcher: download the timed transcript items and their language code from YouTube."""
+    transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+    try:
+        transcript = transcript_list.find_transcript(PREFERRED_LANGUAGES)
+    except NoTranscriptFound:
+        # Fall back to the first available transcript, manually created ones first
+        transcript = next(iter(transcript_list))
+    return transcript.fetch(), transcript.language_code
+
+class TranscriptIndex:
+    """Caption start times in a sorted array with prefix offsets into one joined text buffer."""
+
+    def __init__(self, items):
+        # Lookups bisect on start times, which YouTube already returns in order
+        if any(a["start"] > b["start"] for a, b in zip(items, items[1:])):
+            items = sorted(items, key=lambda item: item["start"])
+        self.items = items
+        # Every item's text is followed by one space, so item i spans offsets[i]..offsets[i+1]-1
+        self.text = "".join([item["text"] + " " for item in items])
+        self.starts = array('d', [item["start"] for item in items])
+        self.offsets = array('q', [0] * (len(items) + 1))
+        position = 0
+        for i, item in enumerate(items):
+            self.offsets[i] = position
+            position += len(item["text"]) + 1
+        self.offsets[len(items)] = position
+
+    def __len__(self):
+        return len(self.starts)
+
+    def item_range(self, start_time, end_time=None):
+        """Indices lo, hi of the items starting in [start_time, end_time)."""
+        lo = bisect_left(self.starts, start_time)
+        hi = len(self.starts) if end_time is None else bisect_left(self.starts, end_time)
+        return lo, max(lo, hi)
+
+    def items_text(self, lo, hi):
+        """Text of items lo..hi-1 joined by spaces, as one slice of the buffer."""
+        if hi <= lo:
+            return ""
+        return self.text[self.offsets[lo]:self.offsets[hi] - 1]
+
+    def text_between(self, start_time, end_time=None):
+        """Text of the items starting in [start_time, end_time)."""
+        return self.items_text(*self.item_range(start_time, end_time))
+
+    def time_at_offset(self, char_pos):
+        """Start time of the item containing a character offset of the buffer."""
+        if not self.starts:
+            return 0
+        idx = bisect_right(self.offsets, char_pos) - 1
+        return self.starts[min(max(idx, 0), len(self.starts) - 1)]
+
+class TranscriptStore:
+    """TTL + LRU cache of raw timed transcript items, one entry per video ID."""
+
+    def __init__(self, fetcher=None, ttl=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.fetcher = fetcher or fetch_from_youtube
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-video locks so concurrent callers share a single fetch
+        self._fetch_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get_fresh(self, video_id):
+        entry = self._entries.get(video_id)
+        if entry is None:
+            return None
+        if self.ttl is not None and time.time() - entry['fetched_at'] > self.ttl:
+            del self._entries[video_id]
+            return None
+        self._entries.move_to_end(video_id)
+        return entry
+
+    def _get_entry(self, video_id):
+        """Return the store entry for a video, fetching the transcript on a miss."""
+        with self._lock:
+            entry = self._get_fresh(video_id)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            fetch_lock = self._fetch_locks.setdefault(video_id, threading.Lock())
+
+        with fetch_lock:
+            # Another caller may have fetched the transcript while we waited
+            with self._lock:
+                entry = self._get_fresh(video_id)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+
+            try:
+                result = self.fetcher(video_id)
+                # Fetchers return the items, or (items, language_code)
+                if isinstance(result, tuple):
+                    items, language = result
+                else:
+                    items, language = result, DEFAULT_LANGUAGE
+                entry = self.put(video_id, list(items or []), language)
+            finally:
+                with self._lock:
+                    self._fetch_locks.pop(video_id, None)
+
+            return entry
+
+    def get_items(self, video_id):
+        """Return the timed transcript items for a video, fetching them on a miss."""
+        return self._get_entry(video_id)['items']
+
+    def get_language(self, video_id):
+        """Return the language code of a video's transcript, fetching it on a miss."""
+        return self._get_entry(video_id)['language']
+
+    def get_index(self, video_id):
+        """Return the TranscriptIndex of a video, building it on first use."""
+        entry = self._get_entry(video_id)
+        index = entry.get('index')
+        if index is None:
+            # Concurrent first calls may both build it; either result is identical
+            index = TranscriptIndex(entry['items'])
+            entry['index'] = index
+        return index
+
+    def put(self, video_id, items, language=DEFAULT_LANGUAGE):
+        """Store transcript items for a video, evicting the least recently used entries."""
+        entry = {'items': items, 'language': language or DEFAULT_LANGUAGE, 'fetched_at': time.time()}
+        with self._lock:
+            self._entries[video_id] = entry
+            self._entries.move_to_end(video_id)
+            while self.max_entries is not None and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, video_id=None):
+        """Drop one video (or every video) from the store."""
+        with self._lock:
+            if video_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(video_id, None)
+
+    def stats(self):
+        """Return cache size and hit/miss counters."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+# Process-wide store shared by every module
+_store = TranscriptStore()
+
+def get_store():
+    """Get the shared transcript store."""
+    return _store
+
+def set_fetcher(fetcher):
+    """Replace the function used to fetch transcripts (e.g. a local stub) and clear the store."""
+    # The fetcher returns a list of {'text', 'start', 'duration'} items, or (items, language_code)
+    _store.fetcher = fetcher or fetch_from_youtube
+    _store.invalidate()
+
+def get_transcript_items(video_id):
+    """Get the raw timed transcript items for a video from the shared store."""
+    return _store.get_items(video_id)
+
+def get_transcript_index(video_id):
+    """Get the indexed transcript of a video for fast time-range lookups."""
+    return _store.get_index(video_id)
+
+def get_transcript_language(video_id):
+    """Get the language code of a video's transcript (e.g. 'en', 'de', 'pt-BR')."""
+    return _store.get_language(video_id)
+
+def get_transcript_text(video_id):
+    """Get the transcript of a video as a single string, in the same start-time order as its index."""
+    index = get_transcript_index(video_id)
+    return index.items_text(0, len(index))
@@ -0,0 +1,226 @@
+import argparse
+import bz2
+import gzip
+import json
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+# Rows inserted per transaction while building
+BUILD_BATCH_SIZE = 10000
+
+# Abstracts of disambiguation pages look like "Mercury may refer to:"
+DISAMBIGUATION_PATTERN = re.compile(r'\b(?:may|can|might) (?:also )?refer to\b', re.IGNORECASE)
+
+def title_key(title):
+    """Normalize a title for exact matching: lowercase, spaces instead of underscores, single spaces."""
+    return re.sub(r'\s+', ' ', title.replace('_', ' ')).strip().lower()
+
+def is_disambiguation(title, abstract):
+    """Whether an article is a disambiguation page."""
+    return title.endswith('(disambiguation)') or bool(DISAMBIGUATION_PATTERN.search(abstract or ''))
+
+def _open_dump(path):
+    """Open a dump file, decompressing .gz and .bz2 on the fly."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+def iter_abstract_xml(path):
+    """Yield (title, abstract, url) from a Wikipedia abstracts dump (enwiki-*-abstract.xml)."""
+    with _open_dump(path) as f:
+        for _, elem in ET.iterparse(f, events=('end',)):
+            if elem.tag != 'doc':
+                continue
+            title = elem.findtext('title') or ''
+            # Titles in the abstracts dump carry a "Wikipedia: " prefix
+            if title.startswith('Wikipedia: '):
+                title = title[len('Wikipedia: '):]
+            yield title, elem.findtext('abstract') or '', elem.findtext('url') or ''
+            # Free each document once read so memory stays flat on multi-GB dumps
+            elem.clear()
+
+def iter_jsonl(path):
+    """Yield (title, abstract, url) or redirects from JSON lines with title, abstract, url and optional redirect."""
+    with _open_dump(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('redirect'):
+                yield record['title'], None, record['redirect']
+            else:
+                yield record['title'], record.get('abstract', ''), record.get('url', '')
+
+def iter_redirects_tsv(path):
+    """Yield (source, target) title pairs from a tab-separated redirects file."""
+    with _open_dump(path) as f:
+        for line in f:
+            parts = line.decode('utf-8').rstrip('\n').split('\t')
+            if len(parts) >= 2 and parts[0] and parts[1]:
+                yield parts[0], parts[1]
+
+def build_index(dump_path, index_path, redirects_path=None):
+    """Build a SQLite index of article abstracts, redirects and a full-text title index from a dump."""
+    started = time.time()
+    conn = sqlite3.connect(index_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(
+        "DROP TABLE IF EXISTS titles_fts;"
+        "DROP TABLE IF EXISTS articles;"
+        "DROP TABLE IF EXISTS redirects;"
+        "CREATE TABLE articles (id INTEGER PRIMARY KEY, title TEXT NOT NULL, title_key TEXT NOT NULL, "
+        "abstract TEXT NOT NULL, url TEXT NOT NULL, disambiguation INTEGER NOT NULL);"
+        "CREATE TABLE redirects (source_key TEXT PRIMARY KEY, target_key TEXT NOT NULL);"
+    )
+
+    records = iter_jsonl(dump_path) if '.jsonl' in dump_path else iter_abstract_xml(dump_path)
+    articles = []
+    redirects = []
+    article_count = 0
+    redirect_count = 0
+
+    def flush():
+        conn.executemany(
+            "INSERT INTO articles (title, title_key, abstract, url, disambiguation) VALUES (?, ?, ?, ?, ?)",
+            articles
+        )
+        conn.executemany("INSERT OR REPLACE INTO redirects (source_key, target_key) VALUES (?, ?)", redirects)
+        conn.commit()
+        articles.clear()
+        redirects.clear()
+
+    for title, abstract, url in records:
+        if not title:
+            continue
+        if abstract is None:
+            # JSON lines redirect record: url holds the target title
+            redirects.append((title_key(title), title_key(url)))
+            redirect_count += 1
+        else:
+            articles.append((title, title_key(title), abstract, url, int(is_disambiguation(title, abstract))))
+            article_count += 1
+        if len(articles) + len(redirects) >= BUILD_BATCH_SIZE:
+            flush()
+            print(f"Indexed {article_count} articles...")
+
+    if redirects_path:
+        for source, target in iter_redirects_tsv(redirects_path):
+            redirects.append((title_key(source), title_key(target)))
+            redirect_count += 1
+            if len(redirects) >= BUILD_BATCH_SIZE:
+                flush()
+    flush()
+
+    print("Building title indexes...")
+    conn.executescript(
+        "CREATE INDEX articles_title_key ON articles (title_key);"
+        "CREATE VIRTUAL TABLE titles_fts USING fts5(title, content='articles', content_rowid='id');"
+        "INSERT INTO titles_fts (titles_fts) VALUES ('rebuild');"
+    )
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"Indexed {article_count} articles and {redirect_count} redirects in {time.time() - started:.1f}s")
+
+class WikipediaIndex:
+    """Read-only lookups of article abstracts in an index built by build_index."""
+
+    def __init__(self, path):
+        self.path = path
+        # sqlite3 connections cannot be shared between threads
+        self._local = threading.local()
+        # Fail fast on a missing or unbuilt index
+        self._connect().execute("SELECT 1 FROM articles LIMIT 1")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def _by_key(self, key):
+        return self._connect().execute(
+            "SELECT title, abstract, url, disambiguation FROM articles WHERE title_key = ? ORDER BY id LIMIT 1",
+            (key,)
+        ).fetchone()
+
+    def _disambiguation_option(self, key):
+        """First article titled "<term> (...)", e.g. "Mercury (planet)" for "Mercury"."""
+        return self._connect().execute(
+            "SELECT title, abstract, url, disambiguation FROM articles "
+            "WHERE title_key >= ? AND title_key < ? AND disambiguation = 0 ORDER BY id LIMIT 1",
+            (key + ' (', key + ' )')
+        ).fetchone()
+
+    def _search(self, term):
+        """Best full-text title match that is not a disambiguation page."""
+        words = re.findall(r'\w+', term)
+        if not words:
+            return None
+        query = '"' + ' '.join(words) + '"'
+        return self._connect().execute(
+            "SELECT a.title, a.abstract, a.url, a.disambiguation FROM titles_fts "
+            "JOIN articles a ON a.id = titles_fts.rowid "
+            "WHERE titles_fts MATCH ? AND a.disambiguation = 0 ORDER BY bm25(titles_fts), a.id LIMIT 1",
+            (query,)
+        ).fetchone()
+
+    def lookup(self, term):
+        """Return {'title', 'abstract', 'url'} for the article best matching term, or None."""
+        key = title_key(term)
+        row = self._by_key(key)
+
+        if row is None:
+            redirect = self._connect().execute(
+                "SELECT target_key FROM redirects WHERE source_key = ?", (key,)
+            ).fetchone()
+            if redirect is not None:
+                key = redirect[0]
+                row = self._by_key(key)
+
+        if row is not None and row[3]:
+            # Like the online lookup, a disambiguation page resolves to its first option
+            row = self._disambiguation_option(key.replace(' (disambiguation)', ''))
+
+        if row is None:
+            row = self._search(term)
+
+        if row is None:
+            return None
+        title, abstract, url, _ = row
+        return {'title': title, 'abstract': abstract, 'url': url}
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline Wikipedia abstract index for key term lookups")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Build an index from an abstracts dump")
+    build_parser.add_argument("dump", help="enwiki-*-abstract.xml[.gz|.bz2], or .jsonl with title/abstract/url/redirect")
+    build_parser.add_argument("index", help="Output SQLite file")
+    build_parser.add_argument("--redirects", help="Tab-separated file of source and target titles")
+
+    lookup_parser = subparsers.add_parser("lookup", help="Look up terms in an index")
+    lookup_parser.add_argument("index")
+    lookup_parser.add_argument("terms", nargs="+")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_index(args.dump, args.index, args.redirects)
+    elif args.command == "lookup":
+        index = WikipediaIndex(args.index)
+        for term in args.terms:
+            started = time.perf_counter()
+            result = index.lookup(term)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            print(f"{term} ({elapsed_ms:.2f} ms): {result['title'] + ' - ' + result['url'] if result else 'not found'}")
+
+if __name__ == "__main__":
+    main()
@@ -1,103 +1,99 @@
+import os
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import spacy
+import threading
 import time
 import wikipedia
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import cache_backend
+import wikipedia_index
+import nlp_resources
 
-# Ensure NLTK data is available
-def ensure_nltk_data():
-    try:
-        nltk.data.find('tokenizers/punkt')
-    except LookupError:
-        nltk.download('punkt')
-    
-    try:
-        nltk.data.find('corpora/stopwords')
-    except LookupError:
-        nltk.download('stopwords')
+# Concurrent lookups, shared by all requests, and the overall request rate to Wikipedia
+LOOKUP_WORKERS = int(os.environ.get('WIKIPEDIA_WORKERS', 4))
+REQUESTS_PER_SECOND = float(os.environ.get('WIKIPEDIA_RATE_LIMIT', 10))
+
+# Found pages are kept for the cache TTL; misses expire sooner in case the article gets written
+NEGATIVE_TTL_SECONDS = int(os.environ.get('WIKIPEDIA_NEGATIVE_TTL', 24 * 3600))
+
+# Local index built with `python wikipedia_index.py build`; when set, lookups never leave the machine
+WIKIPEDIA_INDEX_PATH = os.environ.get('WIKIPEDIA_INDEX')
+
+# Key terms are extracted from the whole transcript in chunks of this many characters
+KEY_TERM_CHUNK_CHARS = int(os.environ.get('KEY_TERM_CHUNK_CHARS', 5000))
+
+# Distinct terms counted at once, so memory stays bounded on very long transcripts
+MAX_TRACKED_TERMS = 20000
+
+ENTITY_LABELS = {'PERSON', 'ORG', 'GPE', 'LOC', 'PRODUCT', 'EVENT', 'WORK_OF_ART', 'FAC', 'NORP'}
+
+# Lookup results per normalized term, misses included
+wikipedia_cache = cache_backend.create_cache('wikipedia_terms')
+
+lookup_executor = ThreadPoolExecutor(max_workers=LOOKUP_WORKERS)
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls evenly at a fixed rate."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self._next_time = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the next call is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            wait_time = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+rate_limiter = RateLimiter(REQUESTS_PER_SECOND)
 
 # Load NLP models
 def load_models():
-    try:
-        # Load spaCy for entity recognition
-        nlp = spacy.load("en_core_web_sm")
-        return nlp
-    except:
-        print("Could not load spaCy model. Using fallback methods.")
-        return None
+    # Shared spaCy pipeline for entity recognition, loaded once per process
+    return nlp_resources.get_spacy()
 
-# Faster extraction of key terms with less processing
-def extract_key_terms(text, nlp, max_terms=10):
-    ensure_nltk_data()
-    
+# Full-coverage extraction of key terms, streamed through spaCy in fixed-size chunks
+def extract_key_terms(text, nlp, max_terms=10, chunk_chars=KEY_TERM_CHUNK_CHARS, n_process=None):
     if nlp:
-        # Process only the first 5000 characters to speed up extraction
-        # This is usually enough to get the main topics
-        sample_text = text[:5000]
-        doc = nlp(sample_text)
+        # Long transcripts are split across worker processes
+        if n_process is None:
+            n_process = nlp_resources.n_process_for(len(text))
+        # Named entities from the whole transcript; NER alone is much cheaper than the full pipeline
+        entity_counter = Counter()
+        docs = nlp_resources.pipe(nlp, iter_text_chunks(text, chunk_chars), disable=nlp_resources.NER_ONLY_DISABLED,
+                                  n_process=n_process)
+        for doc in docs:
+            entity_counter.update(ent.text for ent in doc.ents if ent.label_ in ENTITY_LABELS)
+            _prune_counter(entity_counter)
         
-        # Extract named entities
-        entities = []
-        for ent in doc.ents:
-            if ent.label_ in ['PERSON', 'ORG', 'GPE', 'LOC', 'PRODUCT', 'EVENT', 'WORK_OF_ART', 'FAC', 'NORP']:
-                entities.append(ent.text)
-        
-        # Count entity occurrences and get most common
-        from collections import Counter
-        entity_counter = Counter(entities)
         common_entities = [e for e, _ in entity_counter.most_common(max_terms)]
         
-        # If we still need more terms, look for additional entities in chunks
-        if len(common_entities) < max_terms and len(text) > 5000:
-            # Process middle chunk
-            mid_point = len(text) // 2
-            mid_sample = text[mid_point:mid_point+2000]
-            mid_doc = nlp(mid_sample)
-            
-            for ent in mid_doc.ents:
-                if ent.label_ in ['PERSON', 'ORG', 'GPE', 'LOC', 'PRODUCT', 'EVENT', 'WORK_OF_ART', 'FAC', 'NORP']:
-                    entities.append(ent.text)
-            
-            # Process end chunk for more coverage
-            if len(text) > 7000:
-                end_sample = text[-2000:]
-                end_doc = nlp(end_sample)
-                for ent in end_doc.ents:
-                    if ent.label_ in ['PERSON', 'ORG', 'GPE', 'LOC', 'PRODUCT', 'EVENT', 'WORK_OF_ART', 'FAC', 'NORP']:
-                        entities.append(ent.text)
-        
-        # Update counter with any new entities
-        entity_counter = Counter(entities)
-        common_entities = [e for e, _ in entity_counter.most_common(max_terms)]
-        
-        # If we still don't have enough entities, extract noun phrases
+        # If we still don't have enough entities, extract noun phrases (this pass needs the parser)
         if len(common_entities) < max_terms:
-            noun_phrases = []
-            # From the first chunk
-            for chunk in doc.noun_chunks:
-                if len(chunk.text) > 5:  # Only substantial phrases
-                    noun_phrases.append(chunk.text)
-            
-            # From middle chunk if needed
-            if len(common_entities) + len(noun_phrases) < max_terms and len(text) > 5000:
-                for chunk in mid_doc.noun_chunks:
-                    if len(chunk.text) > 5:
-                        noun_phrases.append(chunk.text)
+            noun_counter = Counter()
+            docs = nlp_resources.pipe(nlp, iter_text_chunks(text, chunk_chars),
+                                      disable=nlp_resources.NOUN_CHUNKS_DISABLED, n_process=n_process)
+            for doc in docs:
+                noun_counter.update(chunk.text for chunk in doc.noun_chunks if len(chunk.text) > 5)  # Only substantial phrases
+                _prune_counter(noun_counter)
             
             # Count and add top noun phrases
-            noun_counter = Counter(noun_phrases)
-            for phrase, _ in noun_counter.most_common(max_terms - len(common_entities)):
-                if phrase.lower() not in [e.lower() for e in common_entities]:
+            seen = {e.lower() for e in common_entities}
+            for phrase, _ in noun_counter.most_common():
+                if len(common_entities) >= max_terms:
+                    break
+                if phrase.lower() not in seen:
+                    seen.add(phrase.lower())
                     common_entities.append(phrase)
         
         return common_entities[:max_terms]
     else:
         # Fallback to a simpler word frequency method
-        import re
-        from nltk.corpus import stopwords
-        stop_words = set(stopwords.words('english'))
+        stop_words = nlp_resources.get_stop_words()
         
         # Extract words, excluding stop words
         words = re.findall(r'\b[a-zA-Z]{4,}\b', text.lower())
@@ -115,67 +111,177 @@ def extract_key_terms(text, nlp, max_terms=10):
         # Return most common
         return [word for word, _ in word_counter.most_common(max_terms)]
 
-# Get Wikipedia information for a given term
-def get_wikipedia_info(term, max_length=500):  # Increased max_length for more complete content
-    # Clean term name
-    term = re.sub(r'[^\w\s]', '', term).strip()
+def iter_text_chunks(text, chunk_chars=KEY_TERM_CHUNK_CHARS):
+    """Yield consecutive chunks of about chunk_chars characters, split at whitespace, covering all of text."""
+    start = 0
+    while start < len(text):
+        end = start + chunk_chars
+        if end < len(text):
+            # Don't cut a word (or an entity) in half
+            space = text.rfind(' ', start + chunk_chars // 2, end)
+            if space != -1:
+                end = space
+        yield text[start:end]
+        start = end
+
+def _prune_counter(counter, max_size=MAX_TRACKED_TERMS):
+    """Keep only the most frequent half of the counter once it grows past max_size."""
+    if len(counter) > max_size:
+        kept = counter.most_common(max_size // 2)
+        counter.clear()
+        counter.update(dict(kept))
+
+def normalize_term(term):
+    """Normalize a term for lookup and caching: no punctuation, single spaces."""
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', '', term)).strip()
+
+def _format_info(title, summary, url, max_length):
+    """Build the title/summary/url dict for an article."""
+    # Get the first 4-5 sentences instead of just 2
+    # Article summaries come from English Wikipedia
+    sentences = nlp_resources.sent_tokenize(summary, 'en')
+    short_summary = " ".join(sentences[:min(5, len(sentences))])
+    
+    # If still too long, truncate
+    if len(short_summary) > max_length:
+        short_summary = short_summary[:max_length] + "..."
+    
+    return {
+        "title": title,
+        "summary": short_summary,
+        "url": url
+    }
+
+def _lookup_wikipedia(term, max_length):
+    """Query Wikipedia for a term; returns None if there is no page, raises on request errors."""
+    # Search for Wikipedia page
+    rate_limiter.acquire()
+    search_results = wikipedia.search(term, results=1)
+    
+    if not search_results:
+        return None
     
     try:
-        # Search for Wikipedia page
-        search_results = wikipedia.search(term, results=1)
-        
-        if not search_results:
-            return None
-        
-        # Get the page
-        page_title = search_results[0]
-        page = wikipedia.page(page_title, auto_suggest=False)
-        
-        # Extract the summary
-        summary = page.summary
-        
-        # Get the first 4-5 sentences instead of just 2
-        sentences = nltk.sent_tokenize(summary)
-        short_summary = " ".join(sentences[:min(5, len(sentences))])
-        
-        # If still too long, truncate
-        if len(short_summary) > max_length:
-            short_summary = short_summary[:max_length] + "..."
-        
-        return {
-            "title": page.title,
-            "summary": short_summary,
-            "url": page.url
-        }
+        rate_limiter.acquire()
+        page = wikipedia.page(search_results[0], auto_suggest=False)
     except wikipedia.exceptions.DisambiguationError as e:
         # Handle disambiguation pages by taking the first option
-        if e.options:
-            try:
-                page = wikipedia.page(e.options[0], auto_suggest=False)
-                summary = page.summary
-                sentences = nltk.sent_tokenize(summary)
-                short_summary = " ".join(sentences[:min(5, len(sentences))])
-                
-                if len(short_summary) > max_length:
-                    short_summary = short_summary[:max_length] + "..."
-                
-                return {
-                    "title": page.title,
-                    "summary": short_summary,
-                    "url": page.url
-                }
-            except:
-                return None
+        if not e.options:
+            return None
+        try:
+            rate_limiter.acquire()
+            page = wikipedia.page(e.options[0], auto_suggest=False)
+        except (wikipedia.exceptions.DisambiguationError, wikipedia.exceptions.PageError):
+            return None
+    except wikipedia.exceptions.PageError:
         return None
+    
+    rate_limiter.acquire()
+    return _format_info(page.title, page.summary, page.url, max_length)
+
+def local_index_backend(path):
+    """Create a lookup backend that reads a local index built with wikipedia_index.py."""
+    index = wikipedia_index.WikipediaIndex(path)
+    
+    def lookup(term, max_length):
+        article = index.lookup(term)
+        if article is None:
+            return None
+        return _format_info(article['title'], article['abstract'], article['url'], max_length)
+    
+    return lookup
+
+# lookup(term, max_length) returns the article info or None, and raises on request errors
+_lookup_backend = _lookup_wikipedia
+_cache_lookups = True
+
+def set_lookup_backend(lookup, use_cache=True):
+    """Replace the function used to look up terms (None restores live Wikipedia)."""
+    global _lookup_backend, _cache_lookups
+    _lookup_backend = lookup or _lookup_wikipedia
+    _cache_lookups = use_cache if lookup else True
+
+if WIKIPEDIA_INDEX_PATH:
+    try:
+        # Local lookups are faster than the cache, so they skip it
+        set_lookup_backend(local_index_backend(WIKIPEDIA_INDEX_PATH), use_cache=False)
+        print(f"Using local Wikipedia index at {WIKIPEDIA_INDEX_PATH}")
     except Exception as e:
+        print(f"Could not open Wikipedia index {WIKIPEDIA_INDEX_PATH}, using live Wikipedia: {e}")
+
+# Get Wikipedia information for a given term
+def get_wikipedia_info(term, max_length=500):  # Increased max_length for more complete content
+    # Clean term name
+    term = normalize_term(term)
+    if not term:
+        return None
+    
+    cache_key = f"{term.lower()}|{max_length}"
+    if _cache_lookups:
+        cached = wikipedia_cache.get(cache_key)
+        if cached is not None:
+            if cached['info'] is not None or time.time() - cached['cached_at'] < NEGATIVE_TTL_SECONDS:
+                return cached['info']
+    
+    try:
+        info = _lookup_backend(term, max_length)
+    except Exception as e:
+        # Request errors are not cached, so the term is retried next time
         print(f"Wikipedia error for term '{term}': {str(e)}")
         return None
+    
+    if _cache_lookups:
+        wikipedia_cache[cache_key] = {'info': info, 'cached_at': time.time()}
+    return info
+
+def lookup_terms(terms, max_hits, progress=None):
+    """Look up terms concurrently until max_hits distinct pages are found; returns hits in term order."""
+    cancelled = threading.Event()
+    
+    def lookup(term):
+        # Lookups still queued when enough hits were found are skipped
+        if cancelled.is_set():
+            return None
+        print(f"Looking up Wikipedia info for: {term}")
+        return get_wikipedia_info(term)
+    
+    futures = {lookup_executor.submit(lookup, term): rank for rank, term in enumerate(terms)}
+    results = {}
+    hits = {}
+    processed_titles = set()  # To avoid duplicate Wikipedia articles
+    next_rank = 0
+    pending = set(futures)
+    
+    while pending and len(hits) < max_hits:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            results[futures[future]] = future.result()
+        
+        # Results are taken in term order, each only once every better-ranked term has resolved,
+        # so the better-ranked term keeps an article two terms share
+        while next_rank in results and len(hits) < max_hits:
+            wiki_info = results.pop(next_rank)
+            if wiki_info and wiki_info["title"] not in processed_titles:
+                processed_titles.add(wiki_info["title"])
+                hits[next_rank] = wiki_info
+            next_rank += 1
+        if progress is not None:
+            progress('wikipedia', len(hits), max_hits)
+    
+    if pending:
+        print(f"Reached target of {max_hits} terms with Wikipedia info, cancelling {len(pending)} lookups")
+        cancelled.set()
+        for future in pending:
+            future.cancel()
+    
+    return [(terms[rank], hits[rank]) for rank in sorted(hits)]
 
 # Generate key terms with Wikipedia information
-def generate_key_points_with_wikipedia(transcript, max_terms=8):
+def generate_key_points_with_wikipedia(transcript, max_terms=8, progress=None):
     """Generate key terms with Wikipedia information using optimized extraction."""
-    ensure_nltk_data()
     nlp = load_models()
+    if progress is not None:
+        progress('key terms')
     
     print(f"Extracting up to {max_terms} key terms from transcript...")
     
@@ -184,43 +290,17 @@ def generate_key_points_with_wikipedia(transcript, max_terms=8):
     
     print(f"Found {len(key_terms)} potential terms: {', '.join(key_terms[:10])}...")
     
-    # Get Wikipedia info for each term in parallel
-    results = []
-    processed_titles = set()  # To avoid duplicate Wikipedia articles
+    # Skip repeated terms
+    unique_terms = []
+    for term in key_terms:
+        if term.lower() not in [t.lower() for t in unique_terms]:
+            unique_terms.append(term)
     
-    # Process terms in batches to improve efficiency
-    for i in range(0, len(key_terms), 3):
-        batch = key_terms[i:i+3]
-        batch_results = []
-        
-        for term in batch:
-            # Skip if we already processed this exact term
-            if term.lower() in [r.get("key_term", "").lower() for r in results]:
-                continue
-                
-            if len(results) >= max_terms:
-                break
-                
-            print(f"Looking up Wikipedia info for: {term}")
-            wiki_info = get_wikipedia_info(term)
-            
-            if wiki_info and wiki_info["title"] not in processed_titles:
-                processed_titles.add(wiki_info["title"])
-                batch_results.append({
-                    "key_term": term,
-                    "wikipedia_info": wiki_info
-                })
-        
-        # Add batch results to main results
-        results.extend(batch_results)
-        
-        # Check if we have enough results
-        if len(results) >= max_terms:
-            print(f"Reached target of {max_terms} terms with Wikipedia info")
-            break
-        
-        # Add a small delay between batches to avoid rate limiting
-        time.sleep(0.1)
+    # Get Wikipedia info for the terms concurrently
+    results = [
+        {"key_term": term, "wikipedia_info": wiki_info}
+        for term, wiki_info in lookup_terms(unique_terms, max_terms, progress)
+    ]
     
     print(f"Found {len(results)} terms with Wikipedia info")
     
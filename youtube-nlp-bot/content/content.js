@@ -102,32 +102,31 @@ chrome.runtime.onMessage.addListener(function(request, sender, sendResponse) {
   if (request.action === 'quickSummarize') {
     console.log('YouTube NLP Assistant: Generating summary');
     displayQuickResult('Generating summary...', 'summary');
-    fetch('http://localhost:5000/api/summarize', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      },
-      body: JSON.stringify({
-        videoId: currentVideoId,
-        minLength: 100,
-        maxLength: 200
-      })
-    })
-    .then(response => {
-      if (!response.ok) {
-        throw new Error(`API responded with status ${response.status}`);
-      }
-      return response.json();
-    })
-    .then(data => {
-      if (data.status === 'success') {
+    
+    // Show each part of the summary as it is streamed, then replace them with the final summary
+    const chunkSummaries = [];
+    fetchEventStream('http://localhost:5000/api/summarize_stream', {
+      videoId: currentVideoId,
+      minLength: 100,
+      maxLength: 200
+    }, (event, data) => {
+      if (event === 'chunk') {
+        chunkSummaries[data.index] = data.summary;
+        const received = chunkSummaries.filter(summary => summary);
+        const partialText = `
+          <p><strong>Video Summary (${received.length}/${data.total} parts so far):</strong></p>
+          <p>${received.join(' ')}</p>
+          <p class="quick-result-note">Still summarizing the rest of the video...</p>
+        `;
+        updateQuickResult(partialText);
+      } else if (event === 'summary') {
         const summaryText = `
           <p><strong>Video Summary:</strong></p>
           <p>${data.summary}</p>
           <p class="quick-result-note">Open extension for more options and full transcript</p>
         `;
         updateQuickResult(summaryText);
-      } else {
+      } else if (event === 'error') {
         throw new Error(data.error || 'Unknown error occurred');
       }
     })
@@ -147,21 +146,9 @@ chrome.runtime.onMessage.addListener(function(request, sender, sendResponse) {
   if (request.action === 'quickKeyPointsWiki') {
     console.log('YouTube NLP Assistant: Generating key points with Wikipedia info');
     displayQuickResult('Generating key points with contextual information...', 'key_points_wiki');
-    fetch('http://localhost:5000/api/keypoints_wiki', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      },
-      body: JSON.stringify({
-        videoId: currentVideoId,
-        numPoints: 5
-      })
-    })
-    .then(response => {
-      if (!response.ok) {
-        throw new Error(`API responded with status ${response.status}`);
-      }
-      return response.json();
+    fetchJobResult('http://localhost:5000/api/keypoints_wiki', {
+      videoId: currentVideoId,
+      numPoints: 5
     })
     .then(data => {
       if (data.status === 'success') {
@@ -269,131 +256,244 @@ chrome.runtime.onMessage.addListener(function(request, sender, sendResponse) {
     sendResponse({status: 'processing'});
     return true;
   }
-});
 
-// Handle quick timestamps request
-if (request.action === 'quickTimestamps') {
-  console.log('YouTube NLP Assistant: Generating timestamps');
-  displayQuickResult('Generating timestamps...', 'timestamps');
+  // Handle quick timestamps request
+  if (request.action === 'quickTimestamps') {
+    console.log('YouTube NLP Assistant: Generating timestamps');
+    displayQuickResult('Generating timestamps...', 'timestamps');
   
-  // Call the timestamps API
-  fetch('http://localhost:5000/api/timestamps', {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json'
-    },
-    body: JSON.stringify({
-      videoId: currentVideoId
+    // Call the timestamps API
+    fetchJobResult('http://localhost:5000/api/timestamps', {
+      videoId: currentVideoId,
+      precomputeSegments: true
     })
-  })
-  .then(response => {
-    if (!response.ok) {
-      throw new Error(`API responded with status ${response.status}`);
-    }
-    return response.json();
-  })
-  .then(data => {
-    if (data.status === 'success') {
-      let timestampsHtml = '<p><strong>Video Timestamps:</strong></p>';
+    .then(data => {
+      if (data.status === 'success') {
+        let timestampsHtml = '<p><strong>Video Timestamps:</strong></p>';
+      
+        data.timestamps.forEach(ts => {
+          timestampsHtml += `
+            <div class="timestamp-item" data-time="${ts.time}" data-segment-id="${ts.segment_id}">
+              <strong>${ts.formatted_time}</strong> - ${ts.title}
+              <div class="segment-summary-container" id="quick-segment-container-${ts.segment_id}"></div>
+            </div>
+          `;
+        });
       
-      data.timestamps.forEach(ts => {
         timestampsHtml += `
-          <div class="timestamp-item" data-time="${ts.time}" data-segment-id="${ts.segment_id}">
-            <strong>${ts.formatted_time}</strong> - ${ts.title}
-            <div class="segment-summary-container" id="quick-segment-container-${ts.segment_id}"></div>
-          </div>
+          <p class="quick-result-note">Click any timestamp to jump to that point and see a summary</p>
+          <p class="quick-result-note">Open extension for more options</p>
         `;
-      });
       
-      timestampsHtml += `
-        <p class="quick-result-note">Click any timestamp to jump to that point and see a summary</p>
-        <p class="quick-result-note">Open extension for more options</p>
-      `;
+        updateQuickResult(timestampsHtml);
       
-      updateQuickResult(timestampsHtml);
-      
-      // Add click handlers for timestamps
-      const timestampItems = document.querySelectorAll('.timestamp-item');
-      timestampItems.forEach(item => {
-        item.addEventListener('click', function() {
-          const timeInSeconds = parseFloat(this.getAttribute('data-time'));
-          const segmentId = parseInt(this.getAttribute('data-segment-id'), 10);
+        // Add click handlers for timestamps
+        const timestampItems = document.querySelectorAll('.timestamp-item');
+        timestampItems.forEach(item => {
+          item.addEventListener('click', function() {
+            const timeInSeconds = parseFloat(this.getAttribute('data-time'));
+            const segmentId = parseInt(this.getAttribute('data-segment-id'), 10);
           
-          // Navigate to this time in the video
-          navigateToVideoTime(timeInSeconds);
+            // Navigate to this time in the video
+            navigateToVideoTime(timeInSeconds);
           
-          // Check if summary is already generated
-          const summaryContainer = document.getElementById(`quick-segment-container-${segmentId}`);
+            // Check if summary is already generated
+            const summaryContainer = document.getElementById(`quick-segment-container-${segmentId}`);
           
-          if (summaryContainer.innerHTML.trim() !== '') {
-            // Summary exists, toggle visibility
-            if (summaryContainer.classList.contains('hidden')) {
-              summaryContainer.classList.remove('hidden');
-            } else {
-              summaryContainer.classList.add('hidden');
+            if (summaryContainer.innerHTML.trim() !== '') {
+              // Summary exists, toggle visibility
+              if (summaryContainer.classList.contains('hidden')) {
+                summaryContainer.classList.remove('hidden');
+              } else {
+                summaryContainer.classList.add('hidden');
+              }
+              return;
             }
-            return;
-          }
           
-          // Show loading state
-          summaryContainer.innerHTML = `
-            <div class="quick-segment-summary" id="quick-segment-summary-${segmentId}">
-              <p>Loading segment summary...</p>
-            </div>
-          `;
+            // Show loading state
+            summaryContainer.innerHTML = `
+              <div class="quick-segment-summary" id="quick-segment-summary-${segmentId}">
+                <p>Loading segment summary...</p>
+              </div>
+            `;
           
-          // Fetch the summary for this segment
-          fetch('http://localhost:5000/api/segment_summary', {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-              videoId: currentVideoId,
-              segmentId: segmentId
+            // Fetch the summary for this segment
+            fetch('http://localhost:5000/api/segment_summary', {
+              method: 'POST',
+              headers: {
+                'Content-Type': 'application/json'
+              },
+              body: JSON.stringify({
+                videoId: currentVideoId,
+                segmentId: segmentId
+              })
             })
-          })
-          .then(response => response.json())
-          .then(data => {
-            if (data.status === 'success') {
+            .then(response => response.json())
+            .then(data => {
+              if (data.status === 'success') {
+                document.getElementById(`quick-segment-summary-${segmentId}`).innerHTML = `
+                  <div class="quick-segment-summary-content">
+                    <p><strong>Summary:</strong> ${data.summary}</p>
+                  </div>
+                `;
+              } else {
+                throw new Error(data.error || 'Unknown error occurred');
+              }
+            })
+            .catch(error => {
               document.getElementById(`quick-segment-summary-${segmentId}`).innerHTML = `
-                <div class="quick-segment-summary-content">
-                  <p><strong>Summary:</strong> ${data.summary}</p>
+                <div class="quick-segment-summary-error">
+                  <p>Error: ${error.message}</p>
                 </div>
               `;
-            } else {
-              throw new Error(data.error || 'Unknown error occurred');
-            }
-          })
-          .catch(error => {
-            document.getElementById(`quick-segment-summary-${segmentId}`).innerHTML = `
-              <div class="quick-segment-summary-error">
-                <p>Error: ${error.message}</p>
-              </div>
-            `;
+            });
           });
         });
-      });
-    } else {
-      throw new Error(data.error || 'Unknown error occurred');
-    }
-  })
-  .catch(error => {
-    console.error('Error generating timestamps:', error);
-    const errorText = `
-      <p class="quick-result-error">Error generating timestamps: ${error.message}</p>
-      <p class="quick-result-note">Make sure the Python backend is running on http://localhost:5000</p>
-    `;
-    updateQuickResult(errorText);
-  });
+      } else {
+        throw new Error(data.error || 'Unknown error occurred');
+      }
+    })
+    .catch(error => {
+      console.error('Error generating timestamps:', error);
+      const errorText = `
+        <p class="quick-result-error">Error generating timestamps: ${error.message}</p>
+        <p class="quick-result-note">Make sure the Python backend is running on http://localhost:5000</p>
+      `;
+      updateQuickResult(errorText);
+    });
   
-  sendResponse({status: 'processing'});
+    sendResponse({status: 'processing'});
+    return true;
+  }
+
+  // Default response for unknown actions
+  sendResponse({status: 'error', message: 'Unknown action'});
   return true;
+});
+
+// How often to check on a background job
+const JOB_POLL_INTERVAL_MS = 1000;
+
+// Progress messages for the stages reported by /api/jobs/<id>
+const JOB_STAGE_LABELS = {
+  'queued': 'Waiting for the server...',
+  'started': 'Starting...',
+  'transcript': 'Fetching transcript...',
+  'chunking': 'Splitting transcript into chunks...',
+  'chunk': 'Summarizing chunks',
+  'meta-summary': 'Combining chunk summaries...',
+  'sentences': 'Splitting transcript into sentences...',
+  'segmentation': 'Finding topic changes...',
+  'keywords': 'Extracting keywords...',
+  'key terms': 'Extracting key terms...',
+  'wikipedia': 'Looking up terms on Wikipedia'
+};
+
+// Describe a job's current stage, e.g. "Summarizing chunks (2/5)"
+function describeJobProgress(job) {
+  const label = JOB_STAGE_LABELS[job.stage] || job.stage;
+  if (job.progress && job.progress.total) {
+    return `${label} (${job.progress.done}/${job.progress.total})`;
+  }
+  return label;
+}
+
+// Poll a background job until it finishes and resolve with its result
+function pollJob(jobId) {
+  return new Promise((resolve, reject) => {
+    function check() {
+      fetch(`http://localhost:5000/api/jobs/${jobId}`)
+      .then(response => {
+        if (!response.ok) {
+          throw new Error(`API responded with status ${response.status}`);
+        }
+        return response.json();
+      })
+      .then(job => {
+        if (job.state === 'done') {
+          resolve(job.result);
+        } else if (job.state === 'failed') {
+          reject(new Error(job.error || 'Unknown error occurred'));
+        } else {
+          updateQuickProgress(describeJobProgress(job));
+          setTimeout(check, JOB_POLL_INTERVAL_MS);
+        }
+      })
+      .catch(reject);
+    }
+    check();
+  });
+}
+
+// POST a request as a background job and wait for its result; cached results come back directly
+function fetchJobResult(url, body) {
+  return fetch(url, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify(Object.assign({}, body, {async: true}))
+  })
+  .then(response => {
+    if (!response.ok) {
+      throw new Error(`API responded with status ${response.status}`);
+    }
+    return response.json();
+  })
+  .then(data => data.status === 'accepted' ? pollJob(data.jobId) : data);
 }
 
-// Default response for unknown actions
-sendResponse({status: 'error', message: 'Unknown action'});
-return true;
+// POST a request and call onEvent(name, data) for each Server-Sent Event in the streamed response.
+// EventSource only supports GET, so the stream is read from fetch instead.
+function fetchEventStream(url, body, onEvent) {
+  return fetch(url, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json'
+    },
+    body: JSON.stringify(body)
+  })
+  .then(response => {
+    if (!response.ok) {
+      throw new Error(`API responded with status ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    function read() {
+      return reader.read().then(({done, value}) => {
+        if (done) {
+          return;
+        }
+        buffer += decoder.decode(value, {stream: true});
+        
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const frame = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          
+          let event = 'message';
+          let data = '';
+          frame.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+              event = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+              data += line.slice(5).trim();
+            }
+          });
+          if (data) {
+            onEvent(event, JSON.parse(data));
+          }
+        }
+        return read();
+      });
+    }
+    return read();
+  });
+}
 
 // Display a quick result overlay on the YouTube page
 function displayQuickResult(loadingMessage, resultType) {
@@ -478,6 +578,7 @@ spinner.style.cssText = `
 `;
 
 const loadingText = document.createElement('p');
+loadingText.id = 'yt-nlp-assistant-loading-text';
 loadingText.textContent = loadingMessage;
 loadingText.style.cssText = `
   margin-top: 10px;
@@ -554,6 +655,14 @@ if (content) {
 }
 }
 
+// Show the progress of a background job under the loading spinner
+function updateQuickProgress(message) {
+const loadingText = document.getElementById('yt-nlp-assistant-loading-text');
+if (loadingText) {
+  loadingText.textContent = message;
+}
+}
+
 // Remove the quick result overlay
 function removeQuickResult() {
 const overlay = document.getElementById('yt-nlp-assistant-overlay');
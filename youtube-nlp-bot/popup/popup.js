@@ -172,7 +172,9 @@ document.addEventListener('DOMContentLoaded', function() {
       body: JSON.stringify({
         videoId: videoId,
         minLength: 150,
-        maxLength: 300
+        maxLength: 300,
+        // Summarize all segments in the background so timestamp clicks are instant
+        precomputeSegments: feature === 'timestamps'
       })
     })
     .then(response => {
@@ -1,14 +1,48 @@
-from youtube_transcript_api import YouTubeTranscriptApi
 import re
 import os
+import json
+import hashlib
+import numpy as np
 import torch
+from sklearn.feature_extraction.text import TfidfVectorizer
 from transformers import pipeline, AutoTokenizer, AutoModelForSeq2SeqLM
+import model_registry
+import transcript_store
+import cache_backend
 
 # Suppress the warnings
 os.environ['TRANSFORMERS_VERBOSITY'] = 'error'
 import warnings
 warnings.filterwarnings('ignore')
 
+# Number of chunks sent to the model together in one padded batch
+DEFAULT_BATCH_SIZE = int(os.environ.get('SUMMARY_BATCH_SIZE', 4))
+
+# BART can handle 1024 tokens per input, including special tokens
+MODEL_MAX_TOKENS = 1024
+
+SUMMARIZER_MODEL = "facebook/bart-large-cnn"
+
+# Chunk summaries for a meta-summary share one model input, within these lengths. When even the
+# shortest summaries don't fit, they are summarized in groups first (see reduce_summaries)
+MIN_CHUNK_SUMMARY_LENGTH = 30
+MAX_CHUNK_SUMMARY_LENGTH = 150
+
+# Captions without punctuation are ranked in pieces of at most this many words
+MAX_EXTRACT_SENTENCE_WORDS = 40
+
+# Content-addressed cache of per-chunk summaries
+chunk_summary_cache = cache_backend.create_cache('chunk_summaries')
+
+def chunk_cache_key(chunk, **generation_params):
+    """Build a cache key from the chunk content, the model and the generation parameters."""
+    params = json.dumps(generation_params, sort_keys=True)
+    digest = hashlib.sha256()
+    for part in (SUMMARIZER_MODEL, params, chunk):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
 def extract_video_id(youtube_url):
     """Extract the video ID from a YouTube URL."""
     video_id_match = re.search(r'(?:v=|\/)([0-9A-Za-z_-]{11}).*', youtube_url)
@@ -19,9 +53,7 @@ def extract_video_id(youtube_url):
 def get_transcript(video_id):
     """Fetch the transcript for a YouTube video."""
     try:
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-        transcript = ' '.join([item['text'] for item in transcript_list])
-        return transcript
+        return transcript_store.get_transcript_text(video_id)
     except Exception as e:
         print(f"Error fetching transcript: {e}")
         return None
@@ -30,7 +62,7 @@ def get_device():
     """Get the appropriate device (GPU or CPU)."""
     return "cuda" if torch.cuda.is_available() else "cpu"
 
-def create_summarizer(model_name="facebook/bart-large-cnn"):
+def create_summarizer(model_name=SUMMARIZER_MODEL):
     """Create a summarization pipeline with the specified model."""
     device = get_device()
     print(f"Using device: {device.upper()}")
@@ -50,6 +82,13 @@ def create_summarizer(model_name="facebook/bart-large-cnn"):
     
     return summarizer
 
+# Load BART once per process and share it across requests
+model_registry.register_model("summarizer", create_summarizer)
+
+def get_summarizer():
+    """Get the shared summarization pipeline, loading it on first use."""
+    return model_registry.get_model("summarizer")
+
 def extract_key_sentences(text, num_sentences=5):
     """Extract key sentences from text as a fallback method."""
     # Split into sentences
@@ -79,95 +118,350 @@ def extract_key_sentences(text, num_sentences=5):
     
     return ' '.join(key_sentences)
 
-def summarize_text(text, target_min_length=100, target_max_length=300):
-    """Generate a comprehensive summary of the provided text."""
-    # Count words to determine appropriate summary length
-    word_count = len(text.split())
-    print(f"Transcript word count: {word_count}")
+def _extract_units(text):
+    """Sentences of a text, with run-on sentences split into pieces of MAX_EXTRACT_SENTENCE_WORDS words."""
+    units = []
+    for sentence in _split_sentences(text):
+        words = sentence.split()
+        if len(words) <= MAX_EXTRACT_SENTENCE_WORDS:
+            units.append(sentence)
+            continue
+        for start in range(0, len(words), MAX_EXTRACT_SENTENCE_WORDS):
+            units.append(' '.join(words[start:start + MAX_EXTRACT_SENTENCE_WORDS]))
+    return units
+
+def extractive_summary(text, target_min_length=100, target_max_length=300):
+    """Fast summary from the sentences most central to the text by TF-IDF similarity, kept in their original order."""
+    sentences = _extract_units(text)
+    if not sentences:
+        return ''
     
-    # For very short videos (< 200 words), use extractive summarization
-    if word_count < 200:
-        print("Text too short for abstractive summarization, using extractive method")
+    try:
+        matrix = TfidfVectorizer(stop_words='english', sublinear_tf=True).fit_transform(sentences)
+    except ValueError:
+        # Nothing but stopwords to rank on
         return extract_key_sentences(text, num_sentences=3)
     
-    # Create summarizer once
-    summarizer = create_summarizer()
+    # Rows are L2-normalized, so a row's dot product with the mean row is its
+    # average cosine similarity to every sentence: one sparse matrix-vector product
+    centroid = np.asarray(matrix.mean(axis=0)).ravel()
+    scores = matrix @ centroid
+    ranked = np.argsort(-scores, kind='stable')
     
-    # Adjust min_length and max_length based on input text length
-    # For shorter content, we want shorter summaries
-    min_length = min(target_min_length, max(30, word_count // 10))
-    max_length = min(target_max_length, max(min_length + 50, word_count // 3))
+    min_length, max_length = summary_lengths(len(text.split()), target_min_length, target_max_length)
+    chosen = []
+    word_count = 0
+    for i in ranked:
+        if word_count >= min_length:
+            break
+        length = len(sentences[i].split())
+        if chosen and word_count + length > max_length:
+            continue
+        chosen.append(i)
+        word_count += length
     
-    print(f"Using min_length={min_length}, max_length={max_length}")
-    
-    # Split into chunks of appropriate size for the model
-    # BART can handle ~1024 tokens
-    max_chunk_length = 800  # Words, not tokens, but approximate
-    chunks = []
+    return ' '.join(sentences[i] for i in sorted(chosen))
+
+def _summary_from_result(result):
+    """Get the summary text from a single pipeline result, or None if it is empty."""
+    if isinstance(result, list):
+        result = result[0] if result else None
+    if result and result.get('summary_text'):
+        return result['summary_text']
+    return None
+
+def iter_chunk_summaries(summarizer, chunks, max_length, min_length, retry_max_length=None,
+                         batch_size=DEFAULT_BATCH_SIZE, use_cache=True, first_batch_size=None):
+    """Summarize chunks in padded batches, yielding (index, summary) as each chunk is done; failed chunks come last."""
+    summaries = [None] * len(chunks)
+    batch_size = max(1, batch_size)
     
-    words = text.split()
-    for i in range(0, len(words), max_chunk_length):
-        chunk = ' '.join(words[i:i + max_chunk_length])
-        if len(chunk.split()) >= 50:  # Only add chunks with reasonable length
-            chunks.append(chunk)
+    # Serve chunks that were already summarized with the same parameters from the cache
+    keys = [chunk_cache_key(chunk, max_length=max_length, min_length=min_length) for chunk in chunks]
+    if use_cache:
+        for i, key in enumerate(keys):
+            summaries[i] = chunk_summary_cache.get(key)
+    pending = [i for i in range(len(chunks)) if summaries[i] is None]
+    if len(pending) < len(chunks):
+        print(f"Reusing {len(chunks) - len(pending)}/{len(chunks)} cached chunk summaries")
+    for i in range(len(chunks)):
+        if summaries[i] is not None:
+            yield i, summaries[i]
     
-    # If no valid chunks, use extractive method
-    if not chunks:
-        return extract_key_sentences(text)
+    # A smaller first batch gets the first summary out sooner when results are streamed
+    batches = []
+    rest = pending
+    if first_batch_size and len(pending) > first_batch_size:
+        batches.append(pending[:first_batch_size])
+        rest = pending[first_batch_size:]
+    batches += [rest[start:start + batch_size] for start in range(0, len(rest), batch_size)]
     
-    # Process each chunk
-    all_summaries = []
-    for i, chunk in enumerate(chunks):
-        print(f"Summarizing chunk {i+1}/{len(chunks)}...")
-        
-        # First try with specified parameters
+    # First try every remaining chunk with the specified parameters, batch by batch
+    submitted = 0
+    for batch_indices in batches:
+        batch = [chunks[i] for i in batch_indices]
+        submitted += len(batch)
+        print(f"Summarizing {len(batch)} chunks ({submitted}/{len(pending)} uncached)...")
         try:
-            result = summarizer(
-                chunk, 
-                max_length=max_length // len(chunks), 
-                min_length=min_length // len(chunks), 
+            results = summarizer(
+                batch,
+                max_length=max_length,
+                min_length=min_length,
                 do_sample=False,
-                truncation=True
+                truncation=True,
+                batch_size=len(batch)
             )
-            
-            if result and len(result) > 0:
-                all_summaries.append(result[0]['summary_text'])
-                continue  # Skip to next chunk if successful
+            for i, result in zip(batch_indices, results or []):
+                summaries[i] = _summary_from_result(result)
         except Exception as e:
-            print(f"Initial summarization attempt failed: {e}")
+            print(f"Batched summarization attempt failed: {e}")
+            if len(batch) > 1:
+                # Isolate the failing chunks so the rest keep the specified parameters
+                for i in batch_indices:
+                    try:
+                        result = summarizer(
+                            chunks[i],
+                            max_length=max_length,
+                            min_length=min_length,
+                            do_sample=False,
+                            truncation=True
+                        )
+                        summaries[i] = _summary_from_result(result)
+                    except Exception as chunk_error:
+                        print(f"Initial summarization attempt failed for chunk {i+1}: {chunk_error}")
+        
+        # Only deterministic first-attempt results are cached
+        for i in batch_indices:
+            if summaries[i] is not None:
+                if use_cache:
+                    chunk_summary_cache.set(keys[i], summaries[i])
+                yield i, summaries[i]
+
+    # Retry the chunks that failed with more permissive parameters
+    for i, chunk in enumerate(chunks):
+        if summaries[i] is not None:
+            continue
         
-        # If the first attempt failed, try with more permissive parameters
         try:
             print(f"Retrying chunk {i+1} with adjusted parameters")
             result = summarizer(
                 chunk, 
-                max_length=max_length, 
+                max_length=retry_max_length or max_length, 
                 min_length=10,  # Very low min_length
                 do_sample=True,  # Enable sampling
                 truncation=True
             )
-            
-            if result and len(result) > 0:
-                all_summaries.append(result[0]['summary_text'])
-                continue
+            summaries[i] = _summary_from_result(result)
         except Exception as e:
             print(f"Second summarization attempt failed: {e}")
         
         # If both attempts failed, extract key sentences from this chunk
-        print(f"Using extractive fallback for chunk {i+1}")
-        all_summaries.append(extract_key_sentences(chunk, num_sentences=2))
+        if summaries[i] is None:
+            print(f"Using extractive fallback for chunk {i+1}")
+            summaries[i] = extract_key_sentences(chunk, num_sentences=2)
+        yield i, summaries[i]
+
+def summarize_chunks(summarizer, chunks, max_length, min_length, retry_max_length=None, batch_size=DEFAULT_BATCH_SIZE,
+                     use_cache=True):
+    """Summarize chunks in padded batches, retrying only the chunks that failed."""
+    summaries = [None] * len(chunks)
+    for i, summary in iter_chunk_summaries(summarizer, chunks, max_length, min_length, retry_max_length, batch_size,
+                                           use_cache):
+        summaries[i] = summary
+    return summaries
+
+def _split_sentences(text):
+    """Split text into sentences on end punctuation."""
+    return [s for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s]
+
+def _token_lengths(tokenizer, pieces):
+    """Count tokens for each piece of text as it would appear mid-document."""
+    if not pieces:
+        return []
+    encoded = tokenizer([' ' + piece for piece in pieces], add_special_tokens=False)
+    return [len(ids) for ids in encoded['input_ids']]
+
+def chunk_text_by_tokens(text, tokenizer, max_tokens=None, overlap_sentences=0):
+    """Pack whole sentences into chunks that fit a token budget, with optional sentence overlap."""
+    if max_tokens is None:
+        max_tokens = min(tokenizer.model_max_length, MODEL_MAX_TOKENS) - tokenizer.num_special_tokens_to_add()
+    
+    # Auto-generated captions often have no punctuation, so split any sentence
+    # that is longer than the budget into word-level pieces
+    units = []
+    sentences = _split_sentences(text)
+    for sentence, length in zip(sentences, _token_lengths(tokenizer, sentences)):
+        if length <= max_tokens:
+            units.append((sentence, length))
+            continue
+        
+        words = sentence.split()
+        piece, piece_length = [], 0
+        for word, word_length in zip(words, _token_lengths(tokenizer, words)):
+            if piece and piece_length + word_length > max_tokens:
+                units.append((' '.join(piece), piece_length))
+                piece, piece_length = [], 0
+            piece.append(word)
+            piece_length += word_length
+        if piece:
+            units.append((' '.join(piece), piece_length))
+    
+    chunks = []
+    token_counts = []
+    current, current_length = [], 0
+    for unit, length in units:
+        if current and current_length + length > max_tokens:
+            chunks.append(' '.join(u for u, _ in current))
+            token_counts.append(current_length)
+            
+            # Carry the last few sentences over for context, if they leave room for new text
+            carried = current[-overlap_sentences:] if overlap_sentences > 0 else []
+            carried_length = sum(l for _, l in carried)
+            if carried_length + length > max_tokens:
+                carried, carried_length = [], 0
+            current, current_length = list(carried), carried_length
+        
+        current.append((unit, length))
+        current_length += length
+    
+    if current:
+        chunks.append(' '.join(u for u, _ in current))
+        token_counts.append(current_length)
+    
+    return chunks, token_counts, max_tokens
+
+def summary_lengths(word_count, target_min_length, target_max_length):
+    """Pick min/max summary lengths for a text; shorter content gets shorter summaries."""
+    min_length = min(target_min_length, max(30, word_count // 10))
+    max_length = min(target_max_length, max(min_length + 50, word_count // 3))
+    return min_length, max_length
+
+def chunk_summary_length(chunk_count, budget):
+    """Max length of each of chunk_count summaries that are joined into one input of budget tokens."""
+    return max(MIN_CHUNK_SUMMARY_LENGTH, min(budget // chunk_count, MAX_CHUNK_SUMMARY_LENGTH))
+
+def reduce_summaries(summarizer, summaries, budget, batch_size=DEFAULT_BATCH_SIZE):
+    """Join summaries, summarizing them in groups (repeatedly, if needed) until the text fits in one model input."""
+    combined = ' '.join(summaries)
+    previous_count = None
+    while True:
+        groups, _, _ = chunk_text_by_tokens(combined, summarizer.tokenizer, max_tokens=budget)
+        if len(groups) <= 1:
+            return combined
+        if previous_count is not None and len(groups) >= previous_count:
+            # No longer shrinking; leave the rest to truncation
+            print(f"Summaries did not shrink below {len(groups)} model inputs")
+            return combined
+        previous_count = len(groups)
+        
+        print(f"Chunk summaries exceed one model input; summarizing them in {len(groups)} groups")
+        group_max_length = chunk_summary_length(len(groups), budget)
+        combined = ' '.join(summarize_chunks(
+            summarizer,
+            groups,
+            max_length=group_max_length,
+            min_length=group_max_length // 3,
+            batch_size=batch_size
+        ))
+
+def summarize_text(text, target_min_length=100, target_max_length=300, batch_size=DEFAULT_BATCH_SIZE,
+                   overlap_sentences=0, stats=None, progress=None):
+    """Generate a comprehensive summary of the provided text (chunking stats are written to stats, if given)."""
+    for event in summarize_text_stream(text, target_min_length, target_max_length, batch_size, overlap_sentences,
+                                       stats, progress):
+        if event['type'] == 'summary':
+            return event['summary']
+
+def summarize_text_stream(text, target_min_length=100, target_max_length=300, batch_size=DEFAULT_BATCH_SIZE,
+                          overlap_sentences=0, stats=None, progress=None, first_batch_size=None):
+    """Like summarize_text, but yield {'type': 'chunk', ...} events as chunk summaries are produced, then the summary."""
+    # Stages are reported as progress(stage, done, total): chunking, chunk i/N, meta-summary
+    report = progress or (lambda stage, done=None, total=None: None)
+    
+    # Count words to determine appropriate summary length
+    word_count = len(text.split())
+    print(f"Transcript word count: {word_count}")
+    
+    # For very short videos (< 200 words), use extractive summarization
+    if word_count < 200:
+        print("Text too short for abstractive summarization, using extractive method")
+        yield {'type': 'summary', 'summary': extract_key_sentences(text, num_sentences=3)}
+        return
+    
+    # Reuse the process-wide summarizer
+    summarizer = get_summarizer()
+    
+    # Adjust min_length and max_length based on input text length
+    min_length, max_length = summary_lengths(word_count, target_min_length, target_max_length)
+    
+    print(f"Using min_length={min_length}, max_length={max_length}")
+    
+    # Pack whole sentences into chunks that fit the model's token limit
+    report('chunking')
+    chunks, token_counts, budget = chunk_text_by_tokens(
+        text,
+        summarizer.tokenizer,
+        overlap_sentences=overlap_sentences
+    )
+    
+    # If no valid chunks, use extractive method
+    if not chunks:
+        yield {'type': 'summary', 'summary': extract_key_sentences(text)}
+        return
+    
+    chunk_stats = {
+        'chunk_count': len(chunks),
+        'token_budget': budget,
+        'total_tokens': sum(token_counts),
+        'fill_ratio': round(sum(token_counts) / (len(chunks) * budget), 3)
+    }
+    print(f"Split transcript into {chunk_stats['chunk_count']} chunks "
+          f"(token fill ratio {chunk_stats['fill_ratio']:.0%})")
+    if stats is not None:
+        stats.update(chunk_stats)
+    
+    # For shorter content or if we only have one chunk, the chunk summaries are the final summary
+    needs_meta_summary = len(chunks) > 1 and word_count >= 500
+    
+    if needs_meta_summary:
+        # Chunk summary lengths depend only on the chunk count, so they are reused
+        # from the cache when a different summary length is requested
+        chunk_max_length = chunk_summary_length(len(chunks), budget)
+        chunk_min_length = chunk_max_length // 3
+    else:
+        chunk_max_length = max_length // len(chunks)
+        chunk_min_length = min_length // len(chunks)
+    
+    # Process the chunks in padded batches, passing each summary on as soon as it is ready
+    all_summaries = [None] * len(chunks)
+    report('chunk', 0, len(chunks))
+    chunk_summaries = iter_chunk_summaries(
+        summarizer,
+        chunks,
+        max_length=chunk_max_length,
+        min_length=chunk_min_length,
+        retry_max_length=max_length,
+        batch_size=batch_size,
+        first_batch_size=first_batch_size
+    )
+    for done, (i, summary) in enumerate(chunk_summaries, 1):
+        all_summaries[i] = summary
+        report('chunk', done, len(chunks))
+        yield {'type': 'chunk', 'index': i, 'total': len(chunks), 'summary': summary}
     
     # Combine the summaries
     if not all_summaries:
-        return extract_key_sentences(text)
-    
-    combined_summary = ' '.join(all_summaries)
+        yield {'type': 'summary', 'summary': extract_key_sentences(text)}
+        return
     
-    # For shorter content or if we only have one chunk, return directly
-    if len(chunks) <= 1 or word_count < 500:
-        return combined_summary
+    if not needs_meta_summary:
+        yield {'type': 'summary', 'summary': ' '.join(all_summaries)}
+        return
     
     # Generate meta-summary for better coherence if needed
+    report('meta-summary')
+    combined_summary = reduce_summaries(summarizer, all_summaries, budget, batch_size)
+    summary = combined_summary
     try:
         print("Generating meta-summary for better coherence...")
         meta_result = summarizer(
@@ -179,13 +473,52 @@ def summarize_text(text, target_min_length=100, target_max_length=300):
         )
         
         if meta_result and len(meta_result) > 0:
-            return meta_result[0]['summary_text']
+            summary = meta_result[0]['summary_text']
     except Exception as e:
         print(f"Meta-summarization failed: {e}")
     
-    return combined_summary
+    yield {'type': 'summary', 'summary': summary}
+
+def summarize_texts(texts, target_min_length=100, target_max_length=300, batch_size=DEFAULT_BATCH_SIZE):
+    """Summarize several independent texts, batching every text that fits in a single chunk."""
+    summaries = [None] * len(texts)
+    summarizer = None
+    # Single-chunk texts grouped by their generation lengths: (min, max) -> [(index, chunk)]
+    groups = {}
+    
+    for i, text in enumerate(texts):
+        word_count = len(text.split())
+        if word_count < 200:
+            summaries[i] = extract_key_sentences(text, num_sentences=3)
+            continue
+        
+        if summarizer is None:
+            summarizer = get_summarizer()
+        chunks, _, _ = chunk_text_by_tokens(text, summarizer.tokenizer)
+        if len(chunks) != 1:
+            # Long texts still need their own chunk and meta-summary passes
+            summaries[i] = summarize_text(text, target_min_length, target_max_length, batch_size=batch_size)
+            continue
+        
+        lengths = summary_lengths(word_count, target_min_length, target_max_length)
+        groups.setdefault(lengths, []).append((i, chunks[0]))
+    
+    # Same parameters as a single-chunk summarize_text call, so results share the chunk cache
+    for (min_length, max_length), entries in groups.items():
+        results = summarize_chunks(
+            summarizer,
+            [chunk for _, chunk in entries],
+            max_length=max_length,
+            min_length=min_length,
+            retry_max_length=max_length,
+            batch_size=batch_size
+        )
+        for (i, _), summary in zip(entries, results):
+            summaries[i] = summary
+    
+    return summaries
 
-def summarize_youtube_video(youtube_url, min_length=100, max_length=300):
+def summarize_youtube_video(youtube_url, min_length=100, max_length=300, stats=None, progress=None):
     """Main function to summarize a YouTube video from its URL."""
     # Extract video ID from URL
     video_id = extract_video_id(youtube_url)
@@ -193,13 +526,16 @@ def summarize_youtube_video(youtube_url, min_length=100, max_length=300):
         return "Invalid YouTube URL. Please provide a valid URL.", None
     
     # Get transcript
+    if progress is not None:
+        progress('transcript')
     transcript = get_transcript(video_id)
     if not transcript:
         return "Could not retrieve transcript. The video might not have captions.", None
     
     # Generate summary
     print(f"Generating summary (target length: {min_length}-{max_length} words)...")
-    summary = summarize_text(transcript, target_min_length=min_length, target_max_length=max_length)
+    summary = summarize_text(transcript, target_min_length=min_length, target_max_length=max_length, stats=stats,
+                             progress=progress)
     
     return summary, transcript
 